@@ -0,0 +1,198 @@
+import asyncio, json, os
+from collections import deque
+
+# الحد الأقصى لعدد الطلبات المنفذة في نفس الوقت لكل العملية.
+# الافتراضي 15 = حجم pool الافتراضي في SQLAlchemy (5 + 10 overflow)، وأقل من threadpool الخاص بـ FastAPI (40)
+GLOBAL_LIMIT = int(os.environ.get("ADMISSION_GLOBAL_LIMIT", "15"))
+
+# الحد الأقصى لمجموع الطلبات المنتظرة؛ عند تجاوزه تُرفض الطلبات الأقل أولوية أولاً
+MAX_QUEUED = int(os.environ.get("ADMISSION_MAX_QUEUED", "100"))
+
+
+class Rejected(Exception):
+    def __init__(self, status, message, retry_after=1):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+class RouteGroup:
+    """
+    مجموعة مسارات لها أولوية (0 هي الأعلى)، وحد للتنفيذ المتزامن، وطابور انتظار بمهلة.
+    """
+
+    def __init__(self, name, priority, limit, max_queue, timeout, paths):
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.paths = frozenset(paths)
+        self.queue = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0  # 429: طابور المجموعة ممتلئ
+        self.shed = 0  # 503: أُسقط لصالح طلب أعلى أولوية
+        self.timed_out = 0  # 503: انتهت مهلة الانتظار
+
+    def waiting(self):
+        return sum(1 for waiter in self.queue if not waiter.done())
+
+    def snapshot(self):
+        return {
+            "priority": self.priority,
+            "limit": self.limit,
+            "inFlight": self.in_flight,
+            "queued": self.waiting(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "timedOut": self.timed_out,
+        }
+
+
+# تسليم الامتحان أولاً، ثم تسجيل الدخول (bcrypt)، ثم القراءات الثقيلة، ثم تعديلات الإدارة
+GROUPS = [
+    RouteGroup("exam", priority=0, limit=8, max_queue=200, timeout=30.0, paths=[
+        "/api/submit_exam",
+    ]),
+    RouteGroup("auth", priority=1, limit=4, max_queue=50, timeout=10.0, paths=[
+        "/api/login", "/api/register", "/api/update_password",
+    ]),
+    RouteGroup("read", priority=2, limit=4, max_queue=50, timeout=10.0, paths=[
+        "/api/load_data", "/api/get_lesson_slides",
+        "/api/get_student_schedule", "/api/get_class_schedule", "/api/teacher_conflicts",
+    ]),
+    RouteGroup("admin", priority=3, limit=2, max_queue=20, timeout=5.0, paths=[
+        "/api/save_lesson", "/api/delete_lesson", "/api/save_module", "/api/delete_module",
+        "/api/save_exam", "/api/delete_exam", "/api/save_student", "/api/delete_student",
+        "/api/delete_class", "/api/retire_exams",
+        "/api/save_student_schedule", "/api/delete_student_schedule",
+    ]),
+]
+
+
+class AdmissionController:
+    """
+    يوزع فرص التنفيذ بين المجموعات حسب الأولوية. يعمل داخل الـ event loop فقط (بدون أقفال).
+    """
+
+    def __init__(self, groups=GROUPS, global_limit=GLOBAL_LIMIT, max_queued=MAX_QUEUED):
+        self.groups = sorted(groups, key=lambda g: g.priority)
+        self.global_limit = global_limit
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self._by_path = {path: group for group in self.groups for path in group.paths}
+
+    def classify(self, path):
+        return self._by_path.get(path)
+
+    def _can_run(self, group):
+        return self.in_flight < self.global_limit and group.in_flight < group.limit
+
+    def _start(self, group):
+        group.in_flight += 1
+        group.admitted += 1
+        self.in_flight += 1
+
+    def _dispatch(self):
+        # كلما تحرر مكان، يأخذه أول منتظر من المجموعة الأعلى أولوية القادرة على التنفيذ
+        for group in self.groups:
+            while group.queue and self._can_run(group):
+                waiter = group.queue.popleft()
+                if waiter.done():
+                    continue
+                self._start(group)
+                waiter.set_result(True)
+            if self.in_flight >= self.global_limit:
+                return
+
+    def _shed_lower_priority(self, group):
+        """يُسقط أحدث منتظر من أقل مجموعة أولوية (أقل من المجموعة المعطاة)؛ يعيد True إذا نجح"""
+        for victim in reversed(self.groups):
+            if victim.priority <= group.priority:
+                return False
+            while victim.queue:
+                waiter = victim.queue.pop()
+                if not waiter.done():
+                    victim.shed += 1
+                    waiter.set_exception(Rejected(503, "Server is busy, request was shed.", retry_after=5))
+                    return True
+        return False
+
+    async def acquire(self, group):
+        if self._can_run(group) and not group.waiting():
+            self._start(group)
+            return
+        if group.waiting() >= group.max_queue:
+            group.rejected += 1
+            raise Rejected(429, "Too many requests of this kind, please retry shortly.")
+        if sum(g.waiting() for g in self.groups) >= self.max_queued and not self._shed_lower_priority(group):
+            group.shed += 1
+            raise Rejected(503, "Server is busy, please retry shortly.", retry_after=5)
+
+        waiter = asyncio.get_running_loop().create_future()
+        group.queue.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, group.timeout)
+        except asyncio.TimeoutError:
+            self._return_if_granted(group, waiter)
+            group.timed_out += 1
+            raise Rejected(503, "Request waited too long in the queue.")
+        except asyncio.CancelledError:
+            # أُلغي الطلب (انقطع الاتصال)
+            self._return_if_granted(group, waiter)
+            raise
+
+    def _return_if_granted(self, group, waiter):
+        # إذا مُنح الطلب مكاناً في نفس لحظة إلغائه، نعيد المكان
+        if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+            self.release(group)
+
+    def release(self, group):
+        group.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def snapshot(self):
+        return {
+            "inFlight": self.in_flight,
+            "limit": self.global_limit,
+            "groups": {group.name: group.snapshot() for group in self.groups},
+        }
+
+
+controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """
+    يطبق حدود التنفيذ المتزامن لكل مجموعة مسارات قبل الوصول إلى نقاط النهاية.
+    المسارات غير المصنفة (مثل / و /api/metrics/*) تمر مباشرة.
+    """
+
+    def __init__(self, app, controller=controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        group = self.controller.classify(scope["path"]) if scope["type"] == "http" else None
+        if group is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire(group)
+        except Rejected as e:
+            body = json.dumps({"detail": e.message}).encode("utf-8")
+            await send({"type": "http.response.start", "status": e.status, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(e.retry_after).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(group)
@@ -0,0 +1,261 @@
+import asyncio, gzip, hashlib, os, time
+from collections import OrderedDict
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli اختياري؛ بدونه نستخدم gzip فقط
+    brotli = None
+
+# أقل حجم (بالبايت) يستحق الضغط؛ الردود الأصغر تُرسل كما هي
+MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", "500"))
+
+# الحد الأقصى لحجم الردود المضغوطة المحفوظة في الذاكرة
+CACHE_MAX_BYTES = int(os.environ.get("COMPRESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# الردود الأكبر من هذا الحجم تُضغط في threadpool حتى لا توقف الـ event loop
+THREADPOOL_SIZE = 256 * 1024
+
+# مسارات GET التي يتكرر فيها نفس المحتوى (شرائح الدروس، والامتحانات داخل load_data)،
+# فتُحفظ نسختها المضغوطة وتُستخدم مباشرة ما دام المحتوى لم يتغير
+CACHEABLE_PATHS = ("/api/get_lesson_slides", "/api/load_data")
+
+# من بينها، المسارات التي نادراً ما يتغير محتواها فتستحق أعلى مستوى ضغط (أبطأ بعشرات المرات).
+# load_data ليس منها: يتغير مع كل كتابة (مثل كل submit_exam أثناء امتحان) فيُضغط بالمستوى العادي
+BEST_QUALITY_PATHS = ("/api/get_lesson_slides",)
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+# مستوى ضغط سريع للردود العادية، وأعلى مستوى لردود BEST_QUALITY_PATHS
+GZIP_LEVEL, GZIP_BEST_LEVEL = 6, 9
+BROTLI_QUALITY, BROTLI_BEST_QUALITY = 5, 11
+
+
+def _gzip(body, best=False):
+    return gzip.compress(body, compresslevel=GZIP_BEST_LEVEL if best else GZIP_LEVEL)
+
+def _brotli(body, best=False):
+    return brotli.compress(body, quality=BROTLI_BEST_QUALITY if best else BROTLI_QUALITY)
+
+ENCODERS = {"gzip": _gzip}
+if brotli is not None:
+    ENCODERS["br"] = _brotli
+
+# br أولاً لأنه أصغر حجماً عند تساوي تفضيل العميل
+PREFERENCE = ("br", "gzip")
+
+
+def negotiate(accept_encoding):
+    """يختار الترميز الأنسب حسب ترويسة Accept-Encoding (مع احترام q=0)"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in PREFERENCE:
+        if encoding not in ENCODERS:
+            continue
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMetrics:
+    """عدادات نسبة الضغط ووقت المعالج المستهلك، لكل ترميز"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.encodings = {}
+        self.skipped = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record(self, encoding, size_in, size_out, cpu_seconds, cached):
+        stats = self.encodings.setdefault(encoding, {
+            "responses": 0, "bytesIn": 0, "bytesOut": 0, "cpuSeconds": 0.0,
+        })
+        stats["responses"] += 1
+        stats["bytesIn"] += size_in
+        stats["bytesOut"] += size_out
+        stats["cpuSeconds"] += cpu_seconds
+        if cached:
+            self.cache_hits += 1
+
+    def snapshot(self):
+        encodings = {}
+        for encoding, stats in self.encodings.items():
+            encodings[encoding] = {
+                **stats,
+                "ratio": round(stats["bytesIn"] / stats["bytesOut"], 2) if stats["bytesOut"] else None,
+            }
+        return {
+            "encodings": encodings,
+            "skipped": self.skipped,
+            "cacheHits": self.cache_hits,
+            "cacheMisses": self.cache_misses,
+            "cacheBytes": cache.size,
+        }
+
+
+class CompressedCache:
+    """LRU للردود المضغوطة، مفتاحها (الترميز، المستوى، بصمة المحتوى) فلا تحتاج إلى إبطال عند التعديل"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._pending = {}  # key -> مهمة الضغط الجارية لنفس المحتوى
+
+    def get(self, key):
+        body = self._items.get(key)
+        if body is not None:
+            self._items.move_to_end(key)
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._items[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def compress(self, key, encoding, body, best):
+        """
+        مهمة ضغط واحدة لكل مفتاح: الطلبات المتزامنة لنفس المحتوى تنتظر نفس المهمة بدلاً من ضغطه
+        كل منها على حدة. يعيد (المهمة، هل بدأها هذا الطلب). تعمل داخل الـ event loop فقط.
+        """
+        task = self._pending.get(key)
+        if task is not None:
+            return task, False
+        task = asyncio.ensure_future(run_in_threadpool(_compress, encoding, body, best))
+        self._pending[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task, True
+
+    def _finish(self, key, task):
+        self._pending.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result()[0])
+
+    def clear(self):
+        self._items.clear()
+        self.size = 0
+
+
+metrics = CompressionMetrics()
+cache = CompressedCache()
+
+
+def _compress(encoding, body, best=False):
+    started = time.thread_time()
+    compressed = ENCODERS[encoding](body, best)
+    return compressed, time.thread_time() - started
+
+
+class CompressionMiddleware:
+    """
+    ضغط الردود (br أو gzip حسب ما يقبله العميل) للردود الأكبر من MINIMUM_SIZE.
+    ردود CACHEABLE_PATHS تُضغط مرة واحدة لكل محتوى ثم تُقدم من الذاكرة.
+    """
+
+    def __init__(self, app, minimum_size=MINIMUM_SIZE, cacheable_paths=CACHEABLE_PATHS,
+                 best_quality_paths=BEST_QUALITY_PATHS):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cacheable_paths = cacheable_paths
+        self.best_quality_paths = best_quality_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        cacheable = scope["method"] == "GET" and scope["path"] in self.cacheable_paths
+        best = cacheable and scope["path"] in self.best_quality_paths
+        start_message = None
+        passthrough = False
+        chunks = []
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                # القرار من الترويسات: الردود غير القابلة للضغط تُمرر فوراً كما هي (حتى لو كانت stream)
+                headers = Headers(raw=message["headers"])
+                content_length = headers.get("content-length")
+                if (
+                    "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    or (content_length is not None and content_length.isdigit() and int(content_length) < self.minimum_size)
+                ):
+                    passthrough = True
+                    metrics.skipped += 1
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_response(send, start_message, b"".join(chunks), encoding, cacheable, best)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_response(self, send, start_message, body, encoding, cacheable, best):
+        headers = MutableHeaders(raw=start_message["headers"])
+        if len(body) < self.minimum_size:
+            metrics.skipped += 1
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        if cacheable:
+            key = (encoding, best, hashlib.blake2b(body, digest_size=16).digest())
+            compressed = cache.get(key)
+            if compressed is not None:
+                metrics.record(encoding, len(body), len(compressed), 0.0, cached=True)
+            else:
+                # الضغط في threadpool دائماً: مهمة مشتركة لا يلغيها انقطاع أحد الطلبات المنتظرة
+                task, started = cache.compress(key, encoding, body, best)
+                compressed, cpu_seconds = await asyncio.shield(task)
+                if started:
+                    metrics.cache_misses += 1
+                    metrics.record(encoding, len(body), len(compressed), cpu_seconds, cached=False)
+                else:
+                    metrics.record(encoding, len(body), len(compressed), 0.0, cached=True)
+        else:
+            if len(body) >= THREADPOOL_SIZE:
+                compressed, cpu_seconds = await run_in_threadpool(_compress, encoding, body)
+            else:
+                compressed, cpu_seconds = _compress(encoding, body)
+            metrics.record(encoding, len(body), len(compressed), cpu_seconds, cached=False)
+
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+        await send(start_message)
+        await send({"type": "http.response.body", "body": compressed})
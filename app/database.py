@@ -1,18 +1,128 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
- 
+import itertools, os, threading, time
+
 # --- Local Database Connection (XAMPP) ---
 # This is the recommended setup for development.
 # Make sure you have a database named 'semester_history_db' in your local phpMyAdmin.
 DATABASE_URL = "mysql+pymysql://root:@localhost/semester_history_db"
 
 # --- Cloud Database Connection (Render/Production) ---
-# DATABASE_URL = os.environ.get("DATABASE_URL")
+# Set the DATABASE_URL environment variable to override the local default.
+DATABASE_URL = os.environ.get("DATABASE_URL", DATABASE_URL)
+
+# --- Read Replicas ---
+# قائمة روابط قواعد البيانات للقراءة فقط مفصولة بفواصل (اختياري).
+# مثال للتجربة المحلية بملفي SQLite:
+#   DATABASE_URL=sqlite:///./primary.db
+#   DATABASE_REPLICA_URLS=sqlite:///./replica.db
+DATABASE_REPLICA_URLS = [u.strip() for u in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+
+# How long (seconds) a client keeps reading from the primary after its own write,
+# so it always sees what it just saved even if the replicas lag behind.
+STICKY_SECONDS = float(os.environ.get("DATABASE_STICKY_SECONDS", "5"))
+
+# How often (seconds) a replica is pinged before it is trusted again.
+REPLICA_HEALTH_INTERVAL = float(os.environ.get("DATABASE_REPLICA_HEALTH_INTERVAL", "10"))
 
-engine = create_engine(DATABASE_URL)
+def make_engine(url):
+    # SQLite connections are shared between FastAPI's worker threads.
+    if url.startswith("sqlite"):
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False})
+
+        # SQLite ignores ON DELETE rules unless foreign keys are enabled per connection.
+        @event.listens_for(sqlite_engine, "connect")
+        def enable_foreign_keys(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+        return sqlite_engine
+    return create_engine(url, pool_pre_ping=True)
+
+engine = make_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+
+class SessionRouter:
+    """
+    يوزع الجلسات: الكتابة دائماً على القاعدة الرئيسية (primary)،
+    والقراءة على النسخ المتماثلة (replicas) بالتناوب مع الرجوع للرئيسية عند تعطلها.
+    """
+
+    def __init__(self, primary_engine, replica_urls, sticky_seconds=STICKY_SECONDS,
+                 health_interval=REPLICA_HEALTH_INTERVAL):
+        self.primary = sessionmaker(autocommit=False, autoflush=False, bind=primary_engine)
+        self.replica_engines = [make_engine(url) for url in replica_urls]
+        self.replicas = [
+            sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+            for replica_engine in self.replica_engines
+        ]
+        self.sticky_seconds = sticky_seconds
+        self.health_interval = health_interval
+        self._cycle = itertools.cycle(range(len(self.replicas)))
+        self._health = {}  # replica index -> (healthy, checked_at)
+        self._probing = set()  # replica indexes with a health check in progress
+        self._last_write = {}  # client key -> monotonic time of last write
+        self._lock = threading.Lock()
+
+    def write_session(self, client_key=None):
+        self.mark_write(client_key)
+        return self.primary()
+
+    def read_session(self, client_key=None):
+        if not self.replicas or self.is_sticky(client_key):
+            return self.primary()
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                index = next(self._cycle)
+            if self.is_healthy(index):
+                return self.replicas[index]()
+        # كل النسخ المتماثلة متعطلة، نرجع للقاعدة الرئيسية
+        return self.primary()
+
+    def mark_write(self, client_key):
+        if client_key is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[client_key] = now
+            # Forget clients whose stickiness window has expired.
+            if len(self._last_write) > 10000:
+                cutoff = now - self.sticky_seconds
+                self._last_write = {k: t for k, t in self._last_write.items() if t >= cutoff}
+
+    def is_sticky(self, client_key):
+        if client_key is None:
+            return False
+        with self._lock:
+            last = self._last_write.get(client_key)
+        return last is not None and time.monotonic() - last < self.sticky_seconds
+
+    def is_healthy(self, index):
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._health.get(index, (True, None))
+            if checked_at is not None and now - checked_at < self.health_interval:
+                return healthy
+            if index in self._probing:
+                # فحص آخر جارٍ الآن: نستخدم النتيجة السابقة بدلاً من انتظار نفس المهلة
+                # (نسخة لم تُفحص بعد تُعامل كمتعطلة حتى ينتهي الفحص الأول)
+                return healthy and checked_at is not None
+            self._probing.add(index)
+        healthy = False
+        try:
+            with self.replica_engines[index].connect() as conn:
+                conn.execute(text("SELECT 1"))
+            healthy = True
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._health[index] = (healthy, time.monotonic())
+                self._probing.discard(index)
+        return healthy
+
+router = SessionRouter(engine, DATABASE_REPLICA_URLS)
@@ -0,0 +1,180 @@
+"""
+منع تكرار طلبات الكتابة بترويسة Idempotency-Key.
+
+المخزن في ذاكرة كل عملية (process): إذا عمل الخادم بعدة workers (مثل uvicorn --workers 4 أو gunicorn)
+فالطلبات المكررة التي تصل إلى worker آخر غير الذي نفذ الطلب الأصلي لا تُمنع وتُنفذ مرة ثانية.
+"""
+import asyncio, hashlib, json, os, time
+from collections import OrderedDict
+from starlette.datastructures import Headers
+
+# مدة الاحتفاظ بالرد المحفوظ لكل مفتاح (بالثواني)
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", str(24 * 60 * 60)))
+
+# الحد الأقصى لعدد المفاتيح المحفوظة في الذاكرة
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+# أقصى مدة (بالثواني) ينتظرها طلب مكرر حتى ينتهي الطلب الأصلي الجاري تنفيذه
+IN_FLIGHT_WAIT = float(os.environ.get("IDEMPOTENCY_IN_FLIGHT_WAIT", "30"))
+
+HEADER = "idempotency-key"
+
+
+class _Entry:
+    def __init__(self, fingerprint, expires_at):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = asyncio.Event()
+        self.response = None  # (status, headers, body) بعد انتهاء الطلب الأصلي
+
+
+class IdempotencyStore:
+    """
+    مخزن في الذاكرة (لكل عملية) لبصمات الطلبات وردودها، مع مدة صلاحية وحد أقصى للحجم.
+    """
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, max_keys=IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+
+    def _purge(self):
+        now = time.monotonic()
+        # المدة ثابتة، فالمفاتيح الأقدم إدخالاً هي الأقرب انتهاءً
+        for key in list(self._entries):
+            entry = self._entries[key]
+            if entry.expires_at > now and len(self._entries) < self.max_keys:
+                break
+            if entry.response is None and entry.expires_at > now:
+                continue  # لا نحذف طلباً ما زال قيد التنفيذ
+            del self._entries[key]
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def begin(self, key, fingerprint):
+        self._purge()
+        entry = _Entry(fingerprint, time.monotonic() + self.ttl)
+        self._entries[key] = entry
+        return entry
+
+    def finish(self, entry, response):
+        entry.response = response
+        entry.done.set()
+
+    def abandon(self, key, entry):
+        """الطلب الأصلي فشل (خطأ 5xx أو استثناء): نحذف المفتاح حتى يُسمح بإعادة المحاولة"""
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        entry.done.set()
+
+    def clear(self):
+        self._entries.clear()
+
+
+store = IdempotencyStore()
+
+
+async def _send_json(send, status, content, extra_headers=()):
+    body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        *extra_headers,
+    ]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """
+    يمنع تكرار تنفيذ طلبات الكتابة عند إعادة المحاولة (مثل submit_exam من اتصال ضعيف).
+    العميل يرسل ترويسة Idempotency-Key بقيمة فريدة لكل عملية؛ إعادة نفس الطلب بنفس المفتاح
+    تعيد الرد الأصلي دون لمس قاعدة البيانات، والطلب المكرر أثناء تنفيذ الأصلي ينتظره ثم يعيد رده.
+    """
+
+    def __init__(self, app, store=store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        # قراءة جسم الطلب كاملاً لحساب البصمة
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        digest = hashlib.sha256()
+        for part in (scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1")):
+            digest.update(part.encode("utf-8") + b"\0")
+        digest.update(body)
+        fingerprint = digest.hexdigest()
+        # المفتاح خاص بكل مستخدم (نفس X-User-Id المستخدم لتوجيه القراءات)، فلا يرى مستخدم رد مستخدم آخر
+        key = (headers.get("x-user-id"), scope["path"], idempotency_key)
+
+        entry = self.store.get(key)
+        while entry is not None:
+            if entry.fingerprint != fingerprint:
+                await _send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request."})
+                return
+            if entry.response is not None:
+                status, headers, response_body = entry.response
+                await send({"type": "http.response.start", "status": status,
+                            "headers": [*headers, (b"idempotent-replayed", b"true")]})
+                await send({"type": "http.response.body", "body": response_body})
+                return
+            try:
+                await asyncio.wait_for(entry.done.wait(), IN_FLIGHT_WAIT)
+            except asyncio.TimeoutError:
+                await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is still in progress."},
+                                 [(b"retry-after", b"1")])
+                return
+            # إذا فشل الطلب الأصلي يُحذف المفتاح، فننفذ هذا الطلب بأنفسنا
+            entry = self.store.get(key)
+
+        entry = self.store.begin(key, fingerprint)
+        response = {}
+        response_chunks = []
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        except BaseException:
+            self.store.abandon(key, entry)
+            raise
+        if response.get("status", 500) >= 500:
+            self.store.abandon(key, entry)
+        else:
+            self.store.finish(entry, (response["status"], response["headers"], b"".join(response_chunks)))
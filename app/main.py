@@ -1,14 +1,27 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from typing import Optional
 import uuid, time
-from app import models, schemas, database
+from app import models, schemas, database, repository, compression, idempotency, admission, timetable
+from app.repository import Repository
 
-# إنشاء جداول قاعدة البيانات إذا لم تكن موجودة
-models.Base.metadata.create_all(bind=database.engine)
+# إنشاء جداول قاعدة البيانات إذا لم تكن موجودة (أو تحميل مخزن الذاكرة)
+repository.init_storage()
 
 app = FastAPI()
 
+# --- منع تكرار طلبات الكتابة (Idempotency-Key) ---
+# داخل الضغط حتى يُحفظ الرد الأصلي غير مضغوط ويُضغط حسب ما يقبله كل عميل
+app.add_middleware(idempotency.IdempotencyMiddleware)
+
+# --- ضغط الردود (br/gzip) ---
+# يُضاف قبل CORS حتى تبقى ترويسات CORS على كل الردود
+app.add_middleware(compression.CompressionMiddleware)
+
+# --- التحكم في القبول (أولويات وحدود تنفيذ لكل مجموعة مسارات) ---
+# خارج الضغط ومنع التكرار حتى يُرفض الطلب الزائد قبل أي عمل، وداخل CORS
+app.add_middleware(admission.AdmissionMiddleware)
+
 # --- إعدادات CORS ---
 # نفس الإعدادات الموجودة في ملف db_connect.php
 origins = [
@@ -29,9 +42,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# دالة للحصول على جلسة قاعدة البيانات
-def get_db():
-    db = database.SessionLocal()
+# مفتاح يميز المستخدم لضمان قراءة ما كتبه بنفسه (read-your-writes).
+# الواجهة الأمامية ترسل X-User-Id بعد تسجيل الدخول؛ بدونه لا يوجد تثبيت على القاعدة الرئيسية
+# (لا نستخدم عنوان IP لأن طلاب المدرسة كلها قد يشتركون في نفس العنوان خلف NAT)
+def client_key(request: Request):
+    return request.headers.get("X-User-Id") or None
+
+# دالة للحصول على مستودع البيانات (للكتابة، على القاعدة الرئيسية)
+def get_db(request: Request):
+    key = client_key(request)
+    db = repository.open_repository(client_key=key)
+    try:
+        yield db
+    finally:
+        db.close()
+        # The stickiness window starts when the write is finished.
+        database.router.mark_write(key)
+
+# دالة للحصول على مستودع للقراءة من القاعدة الرئيسية دائماً (بدون تثبيت)، لقراءات لا تحتمل التأخير
+# مثل تسجيل الدخول مباشرة بعد التسجيل أو بعد تغيير كلمة السر، قبل أن يكون لدى الواجهة X-User-Id
+def get_primary_db():
+    db = repository.open_repository()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# دالة للحصول على مستودع للقراءة فقط (من النسخ المتماثلة إن وجدت)
+def get_read_db(request: Request):
+    db = repository.open_repository(read_only=True, client_key=client_key(request))
     try:
         yield db
     finally:
@@ -39,14 +78,35 @@ def get_db():
 
 # --- نقاط النهاية (Endpoints) ---
 
+@app.get("/")
+def root():
+    """
+    نقطة اتصال جذرية للتحقق من أن الخادم يعمل.
+    """
+    return {"message": "مرحباً بك في الواجهة الخلفية للمشروع. الخادم يعمل بنجاح!"}
+
+@app.get("/api/metrics/compression")
+def compression_metrics():
+    """
+    نسبة الضغط ووقت المعالج المستهلك وإحصائيات ذاكرة الردود المضغوطة.
+    """
+    return compression.metrics.snapshot()
+
+@app.get("/api/metrics/admission")
+def admission_metrics():
+    """
+    عدد الطلبات المنفذة والمنتظرة والمرفوضة لكل مجموعة مسارات.
+    """
+    return admission.controller.snapshot()
+
 @app.post("/api/login", response_model=schemas.LoginResponse)
-def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+def login(user_credentials: schemas.UserLogin, db: Repository = Depends(get_primary_db)):
     """
     يحل محل ملف login.php
     """
-    user = db.query(models.User).filter(models.User.email == user_credentials.email).first()
+    user = db.find_one("users", email=user_credentials.email)
     
-    if not user or not models.verify_password(user_credentials.password, user.password):
+    if not user or not models.verify_password(user_credentials.password, user["password"]):
         raise HTTPException(
             status_code=401, # Unauthorized
             detail={"status": "error", "message": "خطأ في البريد الإلكتروني أو كلمة السر."},
@@ -58,52 +118,44 @@ def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     return {"status": "success", "user": user}
 
 @app.post("/api/register", response_model=schemas.RegisterResponse)
-def register(student_data: schemas.StudentRegister, db: Session = Depends(get_db)):
+def register(student_data: schemas.StudentRegister, db: Repository = Depends(get_db)):
     """
     يحل محل ملف register.php
     """
-    existing_user = db.query(models.User).filter(models.User.email == student_data.email).first()
+    existing_user = db.find_one("users", email=student_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail={"status": "error", "message": "هذا البريد الإلكتروني مسجل بالفعل."})
 
-    new_user = models.User(
-        id=str(uuid.uuid4()),
-        name=student_data.name,
-        email=student_data.email,
-                password=models.hash_password(student_data.password),
-        class_=student_data.class_,
-        role='student'
-    )
-    db.add(new_user)
+    new_user = db.insert("users", {
+        "id": str(uuid.uuid4()),
+        "name": student_data.name,
+        "email": student_data.email,
+        "password": models.hash_password(student_data.password),
+        "class_": student_data.class_,
+        "role": 'student',
+    })
     db.commit()
-    db.refresh(new_user)
+    timetable.schedules.set_student_class(new_user["id"], new_user["class_"])
     
     # Convert to Pydantic model to ensure proper serialization.
     user_response = schemas.User.model_validate(new_user)
     return {"status": "success", "message": "تم إنشاء حسابك بنجاح! يمكنك الآن تسجيل الدخول.", "user": user_response}
 
 @app.get("/api/load_data")
-def load_data(db: Session = Depends(get_db)):
+def load_data(db: Repository = Depends(get_read_db)):
     """
     يحل محل ملف load_data.php (نسخة مبسطة)
     """
     try:
-        # تحويل جداول الطلاب إلى قاموس منظم
-        student_schedules_query = db.query(models.StudentSchedule).all()
-        student_schedules_dict = {}
-        for ss in student_schedules_query:
-            if ss.studentId not in student_schedules_dict:
-                student_schedules_dict[ss.studentId] = {}
-            if ss.day not in student_schedules_dict[ss.studentId]:
-                student_schedules_dict[ss.studentId][ss.day] = []
-            student_schedules_dict[ss.studentId][ss.day].append(schemas.StudentScheduleEntry.from_orm(ss).dict())
+        # جداول الطلاب من الجدول المحسوب مسبقاً (timetable) بدلاً من تجميعها في كل طلب
+        student_schedules_dict = timetable.schedules.all_student_schedules()
 
         data = {
-            'users': db.query(models.User).all(),
-            'lessons': db.query(models.Lesson).all(),
-            'modules': db.query(models.Module).all(),
-            'exams': db.query(models.Exam).all(),
-            'results': db.query(models.Result).all(),
+            'users': db.all("users"),
+            'lessons': db.all("lessons"),
+            'modules': db.all("modules"),
+            'exams': db.all("exams"),
+            'results': db.all("results"),
             'schedules': {}, # سيتم التعامل معها لاحقاً
             'studentSchedules': student_schedules_dict, # جلب جداول الطلاب الخاصة
             'groups': [], # سيتم التعامل معها لاحقاً
@@ -118,35 +170,34 @@ def load_data(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Database query failed: {str(e)}")
 
 @app.post("/api/save_lesson")
-def save_lesson(lesson_data: schemas.LessonSave, db: Session = Depends(get_db)):
+def save_lesson(lesson_data: schemas.LessonSave, db: Repository = Depends(get_db)):
     """
     يحل محل ملف save_lesson.php
     """
     try:
         if lesson_data.id:
             # --- تحديث درس موجود ---
-            db_lesson = db.query(models.Lesson).filter(models.Lesson.id == lesson_data.id).first()
-            if not db_lesson:
+            updated = db.update("lessons", lesson_data.id, {
+                "title": lesson_data.title,
+                "description": lesson_data.description,
+                "class_": lesson_data.class_,
+                "moduleId": lesson_data.moduleId,
+                "slides": lesson_data.slides,
+            })
+            if not updated:
                 raise HTTPException(status_code=404, detail="Lesson not found")
-
-            db_lesson.title = lesson_data.title
-            db_lesson.description = lesson_data.description
-            db_lesson.class_ = lesson_data.class_
-            db_lesson.moduleId = lesson_data.moduleId
-            db_lesson.slides = lesson_data.slides
             message = "تم تحديث الدرس بنجاح"
         else:
             # --- إنشاء درس جديد ---
-            new_lesson = models.Lesson(
-                id=str(uuid.uuid4()),
-                title=lesson_data.title,
-                description=lesson_data.description,
-                class_=lesson_data.class_,
-                moduleId=lesson_data.moduleId,
-                slides=lesson_data.slides,
-                createdAt=int(time.time() * 1000) # Timestamp in milliseconds
-            )
-            db.add(new_lesson)
+            db.insert("lessons", {
+                "id": str(uuid.uuid4()),
+                "title": lesson_data.title,
+                "description": lesson_data.description,
+                "class_": lesson_data.class_,
+                "moduleId": lesson_data.moduleId,
+                "slides": lesson_data.slides,
+                "createdAt": int(time.time() * 1000) # Timestamp in milliseconds
+            })
             message = "تم حفظ الدرس بنجاح"
 
         db.commit()
@@ -156,15 +207,13 @@ def save_lesson(lesson_data: schemas.LessonSave, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Could not save lesson: {str(e)}")
 
 @app.post("/api/delete_lesson")
-def delete_lesson(item: schemas.DeleteItem, db: Session = Depends(get_db)):
+def delete_lesson(item: schemas.DeleteItem, db: Repository = Depends(get_db)):
     """
     يحل محل ملف delete_lesson.php
     """
     try:
-        db_lesson = db.query(models.Lesson).filter(models.Lesson.id == item.id).first()
-        if not db_lesson:
+        if not db.delete("lessons", item.id):
             raise HTTPException(status_code=404, detail="Lesson not found")
-        db.delete(db_lesson)
         db.commit()
         return {"status": "success", "message": "تم حذف الدرس بنجاح"}
     except Exception as e:
@@ -172,23 +221,23 @@ def delete_lesson(item: schemas.DeleteItem, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Could not delete lesson: {str(e)}")
 
 @app.post("/api/save_module")
-def save_module(module_data: schemas.ModuleSave, db: Session = Depends(get_db)):
+def save_module(module_data: schemas.ModuleSave, db: Repository = Depends(get_db)):
     try:
         if module_data.id:
-            db_module = db.query(models.Module).filter(models.Module.id == module_data.id).first()
-            if not db_module: raise HTTPException(status_code=404, detail="Module not found")
-            db_module.name = module_data.name
-            db_module.description = module_data.description
-            db_module.class_ = module_data.class_
+            updated = db.update("modules", module_data.id, {
+                "name": module_data.name,
+                "description": module_data.description,
+                "class_": module_data.class_,
+            })
+            if not updated: raise HTTPException(status_code=404, detail="Module not found")
             message = "تم تحديث الوحدة بنجاح"
         else:
-            new_module = models.Module(
-                id=str(uuid.uuid4()),
-                name=module_data.name,
-                description=module_data.description,
-                class_=module_data.class_
-            )
-            db.add(new_module)
+            db.insert("modules", {
+                "id": str(uuid.uuid4()),
+                "name": module_data.name,
+                "description": module_data.description,
+                "class_": module_data.class_
+            })
             message = "تم حفظ الوحدة بنجاح"
         db.commit()
         return {"status": "success", "message": message}
@@ -197,12 +246,10 @@ def save_module(module_data: schemas.ModuleSave, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Could not save module: {str(e)}")
 
 @app.post("/api/delete_module")
-def delete_module(item: schemas.DeleteItem, db: Session = Depends(get_db)):
+def delete_module(item: schemas.DeleteItem, db: Repository = Depends(get_db)):
     try:
-        db.query(models.Lesson).filter(models.Lesson.moduleId == item.id).update({"moduleId": None})
-        db_module = db.query(models.Module).filter(models.Module.id == item.id).first()
-        if not db_module: raise HTTPException(status_code=404, detail="Module not found")
-        db.delete(db_module)
+        # الدروس تنفصل عن الوحدة تلقائياً (ON DELETE SET NULL)
+        if not db.delete("modules", item.id): raise HTTPException(status_code=404, detail="Module not found")
         db.commit()
         return {"status": "success", "message": "تم حذف الوحدة بنجاح"}
     except Exception as e:
@@ -210,29 +257,28 @@ def delete_module(item: schemas.DeleteItem, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Could not delete module: {str(e)}")
 
 @app.post("/api/save_exam")
-def save_exam(exam_data: schemas.ExamSave, db: Session = Depends(get_db)):
+def save_exam(exam_data: schemas.ExamSave, db: Repository = Depends(get_db)):
     try:
         if exam_data.id:
-            db_exam = db.query(models.Exam).filter(models.Exam.id == exam_data.id).first()
-            if not db_exam: raise HTTPException(status_code=404, detail="Exam not found")
-            
-            db_exam.title = exam_data.title
-            db_exam.class_ = exam_data.class_
-            db_exam.duration = exam_data.duration
-            db_exam.questions = [q.dict() for q in exam_data.questions]
-            db_exam.confirmOnSubmit = exam_data.confirmOnSubmit
+            updated = db.update("exams", exam_data.id, {
+                "title": exam_data.title,
+                "class_": exam_data.class_,
+                "duration": exam_data.duration,
+                "questions": [q.dict() for q in exam_data.questions],
+                "confirmOnSubmit": exam_data.confirmOnSubmit,
+            })
+            if not updated: raise HTTPException(status_code=404, detail="Exam not found")
             
             message = "تم تحديث الامتحان بنجاح"
         else:
-            new_exam = models.Exam(
-                id=str(uuid.uuid4()),
-                title=exam_data.title,
-                class_=exam_data.class_,
-                duration=exam_data.duration,
-                questions=[q.dict() for q in exam_data.questions],
-                confirmOnSubmit=exam_data.confirmOnSubmit
-            )
-            db.add(new_exam)
+            db.insert("exams", {
+                "id": str(uuid.uuid4()),
+                "title": exam_data.title,
+                "class_": exam_data.class_,
+                "duration": exam_data.duration,
+                "questions": [q.dict() for q in exam_data.questions],
+                "confirmOnSubmit": exam_data.confirmOnSubmit
+            })
             message = "تم حفظ الامتحان بنجاح"
         db.commit()
         return {"status": "success", "message": message}
@@ -241,12 +287,10 @@ def save_exam(exam_data: schemas.ExamSave, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Could not save exam: {str(e)}")
 
 @app.post("/api/delete_exam")
-def delete_exam(item: schemas.DeleteItem, db: Session = Depends(get_db)):
+def delete_exam(item: schemas.DeleteItem, db: Repository = Depends(get_db)):
     try:
-        db.query(models.Result).filter(models.Result.examId == item.id).delete()
-        db_exam = db.query(models.Exam).filter(models.Exam.id == item.id).first()
-        if not db_exam: raise HTTPException(status_code=404, detail="Exam not found")
-        db.delete(db_exam)
+        # النتائج تُحذف تلقائياً مع الامتحان (ON DELETE CASCADE)
+        if not db.delete("exams", item.id): raise HTTPException(status_code=404, detail="Exam not found")
         db.commit()
         return {"status": "success", "message": "تم حذف الامتحان ونتائجه بنجاح"}
     except Exception as e:
@@ -254,74 +298,110 @@ def delete_exam(item: schemas.DeleteItem, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Could not delete exam: {str(e)}")
 
 @app.post("/api/save_student")
-def save_student(student_data: schemas.StudentSave, db: Session = Depends(get_db)):
+def save_student(student_data: schemas.StudentSave, db: Repository = Depends(get_db)):
     try:
         if student_data.id:
-            db_student = db.query(models.User).filter(models.User.id == student_data.id).first()
-            if not db_student: raise HTTPException(status_code=404, detail="Student not found")
-            db_student.name = student_data.name
-            db_student.email = student_data.email
-            db_student.class_ = student_data.class_
+            fields = {
+                "name": student_data.name,
+                "email": student_data.email,
+                "class_": student_data.class_,
+            }
             if student_data.password: # كلمة المرور اختيارية عند التعديل
-                db_student.password = models.hash_password(student_data.password)
+                fields["password"] = models.hash_password(student_data.password)
+            if not db.update("users", student_data.id, fields): raise HTTPException(status_code=404, detail="Student not found")
+            student_id = student_data.id
             message = "تم تحديث بيانات الطالب"
         else:
-            new_student = models.User(
-                id=str(uuid.uuid4()),
-                name=student_data.name,
-                email=student_data.email,
-                password=models.User.hash_password(student_data.password),
-                class_=student_data.class_,
-                role='student'
-            )
-            db.add(new_student)
+            student_id = str(uuid.uuid4())
+            db.insert("users", {
+                "id": student_id,
+                "name": student_data.name,
+                "email": student_data.email,
+                "password": models.hash_password(student_data.password),
+                "class_": student_data.class_,
+                "role": 'student'
+            })
             message = "تم إضافة الطالب بنجاح"
         db.commit()
+        timetable.schedules.set_student_class(student_id, student_data.class_)
         return {"status": "success", "message": message}
     except Exception as e:
         db.rollback()
         # Check for duplicate email
-        if "Duplicate entry" in str(e):
+        if isinstance(e, repository.DuplicateError):
             raise HTTPException(status_code=400, detail="هذا البريد الإلكتروني مسجل بالفعل.")
         raise HTTPException(status_code=500, detail=f"Could not save student: {str(e)}")
 
 @app.post("/api/delete_student")
-def delete_student(item: schemas.DeleteItem, db: Session = Depends(get_db)):
+def delete_student(item: schemas.DeleteItem, db: Repository = Depends(get_db)):
     try:
-        db.query(models.Result).filter(models.Result.userId == item.id).delete()
-        db_student = db.query(models.User).filter(models.User.id == item.id).first()
-        if not db_student: raise HTTPException(status_code=404, detail="Student not found")
-        db.delete(db_student)
+        # النتائج والجدول الخاص تُحذف تلقائياً مع الطالب (ON DELETE CASCADE)
+        if not db.delete("users", item.id): raise HTTPException(status_code=404, detail="Student not found")
         db.commit()
+        timetable.schedules.remove_student(item.id)
         return {"status": "success", "message": "تم حذف الطالب ونتائجه بنجاح"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Could not delete student: {str(e)}")
 
+@app.post("/api/delete_class")
+def delete_class(item: schemas.ClassDelete, db: Repository = Depends(get_db)):
+    """
+    يحذف كل طلاب الصف مع نتائجهم وجداولهم في عملية واحدة (لتنظيف نهاية العام).
+    """
+    try:
+        deleted = db.delete_many("users", class_=item.class_, role='student')
+        db.commit()
+        timetable.schedules.invalidate()
+        return {"status": "success", "message": "تم حذف طلاب الصف ونتائجهم بنجاح", "deleted": deleted}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Could not delete class: {str(e)}")
+
+@app.post("/api/retire_exams")
+def retire_exams(item: schemas.ExamsRetire, db: Repository = Depends(get_db)):
+    """
+    يحذف امتحانات الفصل الدراسي (بالمعرفات و/أو بالصف) مع نتائجها في عملية واحدة.
+    """
+    criteria = {}
+    if item.ids is not None:
+        criteria["id"] = item.ids
+    if item.class_ is not None:
+        criteria["class_"] = item.class_
+    if not criteria:
+        raise HTTPException(status_code=400, detail="Specify exam ids or a class")
+
+    try:
+        deleted = db.delete_many("exams", **criteria)
+        db.commit()
+        return {"status": "success", "message": "تم حذف الامتحانات ونتائجها بنجاح", "deleted": deleted}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Could not retire exams: {str(e)}")
+
 @app.post("/api/submit_exam")
-def submit_exam(result_data: schemas.ExamSubmit, db: Session = Depends(get_db)):
+def submit_exam(result_data: schemas.ExamSubmit, db: Repository = Depends(get_db)):
     try:
-        exam = db.query(models.Exam).filter(models.Exam.id == result_data.examId).first()
+        exam = db.get("exams", result_data.examId, fields=["questions"])
         if not exam:
             raise HTTPException(status_code=404, detail="Exam not found")
 
         score = 0
-        for i, question in enumerate(exam.questions):
+        for i, question in enumerate(exam["questions"]):
             if question['answer'] == result_data.studentAnswers[i]:
                 score += 1
         
-        total = len(exam.questions)
-
-        new_result = models.Result(
-            id=str(uuid.uuid4()),
-            userId=result_data.userId,
-            examId=result_data.examId,
-            score=score,
-            total=total,
-            at=result_data.at,
-            studentAnswers=result_data.studentAnswers
-        )
-        db.add(new_result)
+        total = len(exam["questions"])
+
+        db.insert("results", {
+            "id": str(uuid.uuid4()),
+            "userId": result_data.userId,
+            "examId": result_data.examId,
+            "score": score,
+            "total": total,
+            "at": result_data.at,
+            "studentAnswers": result_data.studentAnswers
+        })
         db.commit()
 
         return {"status": "success", "message": "تم تسليم الامتحان بنجاح.", "score": score, "total": total}
@@ -330,59 +410,82 @@ def submit_exam(result_data: schemas.ExamSubmit, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Could not submit exam: {str(e)}")
 
 @app.get("/api/get_lesson_slides")
-def get_lesson_slides(id: str, db: Session = Depends(get_db)):
-    lesson = db.query(models.Lesson.slides).filter(models.Lesson.id == id).first()
+def get_lesson_slides(id: str, db: Repository = Depends(get_read_db)):
+    lesson = db.get("lessons", id, fields=["slides"])
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    return lesson.slides
+    return lesson["slides"]
 
 @app.post("/api/save_student_schedule")
-def save_student_schedule(entry_data: schemas.StudentScheduleSave, db: Session = Depends(get_db)):
+def save_student_schedule(entry_data: schemas.StudentScheduleSave, db: Repository = Depends(get_db)):
     try:
         # Check if an entry for this student, day, and time already exists
-        db_entry = db.query(models.StudentSchedule).filter(
-            models.StudentSchedule.studentId == entry_data.studentId,
-            models.StudentSchedule.day == entry_data.day,
-            models.StudentSchedule.time == entry_data.time
-        ).first()
+        db_entry = db.find_one(
+            "student_schedules",
+            studentId=entry_data.studentId,
+            day=entry_data.day,
+            time=entry_data.time,
+        )
 
         if db_entry:
             # Update existing entry
-            db_entry.subject = entry_data.subject
-            db_entry.teacher = entry_data.teacher
+            fields = {"subject": entry_data.subject, "teacher": entry_data.teacher}
+            db.update("student_schedules", db_entry["id"], fields)
+            saved_entry = {**db_entry, **fields}
             message = "تم تحديث الحصة بنجاح"
         else:
             # Create new entry
-            new_entry = models.StudentSchedule(**entry_data.dict())
-            db.add(new_entry)
+            saved_entry = db.insert("student_schedules", entry_data.dict())
             message = "تم حفظ الحصة بنجاح"
         
         db.commit()
+        timetable.schedules.save_entry(saved_entry)
         return {"status": "success", "message": message}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Could not save schedule entry: {str(e)}")
 
 @app.post("/api/delete_student_schedule")
-def delete_student_schedule(item: schemas.StudentScheduleSave, db: Session = Depends(get_db)):
+def delete_student_schedule(item: schemas.StudentScheduleSave, db: Repository = Depends(get_db)):
     try:
-        db_entry = db.query(models.StudentSchedule).filter_by(studentId=item.studentId, day=item.day, time=item.time).first()
-        if not db_entry: raise HTTPException(status_code=404, detail="Schedule entry not found")
-        db.delete(db_entry)
+        deleted = db.delete_where("student_schedules", studentId=item.studentId, day=item.day, time=item.time)
+        if not deleted: raise HTTPException(status_code=404, detail="Schedule entry not found")
         db.commit()
+        timetable.schedules.delete_entry(item.studentId, item.day, item.time)
         return {"status": "success", "message": "تم حذف الحصة بنجاح"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Could not delete schedule entry: {str(e)}")
 
+@app.get("/api/get_student_schedule")
+def get_student_schedule(id: str):
+    """
+    جدول حصص طالب واحد: day -> [الحصص]
+    """
+    return timetable.schedules.student_schedule(id)
+
+@app.get("/api/get_class_schedule")
+def get_class_schedule(class_: str):
+    """
+    جدول حصص الصف: day -> time -> [المادة والمعلم وعدد الطلاب]
+    """
+    return timetable.schedules.class_schedule(class_)
+
+@app.get("/api/teacher_conflicts")
+def teacher_conflicts(teacher: Optional[str] = None):
+    """
+    المعلمون المحجوزون في نفس اليوم والوقت لأكثر من صف أو مادة.
+    """
+    return timetable.schedules.teacher_conflicts(teacher)
+
 @app.post("/api/update_password")
-def update_password(update_data: schemas.PasswordUpdate, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == update_data.userId).first()
+def update_password(update_data: schemas.PasswordUpdate, db: Repository = Depends(get_db)):
+    user = db.get("users", update_data.userId, fields=["id"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     try:
-        user.password = models.User.hash_password(update_data.newPassword)
+        db.update("users", update_data.userId, {"password": models.hash_password(update_data.newPassword)})
         db.commit()
         return {"status": "success", "message": "تم تحديث كلمة المرور بنجاح."}
     except Exception as e:
@@ -0,0 +1,285 @@
+import atexit, itertools, json, os, threading, time
+from app.repository import Repository, DuplicateError, ENTITIES, cascades, column_defaults, column_names
+
+# الفهارس لكل جدول: كل فهرس هو مجموعة أعمدة تُستخدم كمفتاح في قاموس (hash index)
+INDEXES = {
+    "users": [("email",), ("class_",)],
+    "lessons": [("class_",), ("moduleId",)],
+    "modules": [("class_",)],
+    "exams": [("class_",)],
+    "results": [("userId",), ("examId",)],
+    "student_schedules": [("studentId", "day", "time"), ("studentId",)],
+}
+
+# فهارس لا تقبل التكرار (مثل unique=True في models.py)
+UNIQUE_INDEXES = {("users", ("email",))}
+
+# أقل مدة (بالثواني) بين كتابتين متتاليتين لملف النسخة على القرص
+SNAPSHOT_INTERVAL = float(os.environ.get("MEMORY_SNAPSHOT_INTERVAL", "1"))
+
+def _values(value):
+    """قيمة الشرط كمجموعة قيم (القوائم تعني IN)"""
+    return value if isinstance(value, (list, tuple, set)) else (value,)
+
+def _duplicate_error(key, cols):
+    # نفس رسالة MySQL، ونفس نوع الخطأ الذي يرفعه SQLRepository
+    return DuplicateError(f"Duplicate entry '{'-'.join(map(str, key))}' for key '{'_'.join(cols)}'")
+
+# علامة الصف المحذوف في التغييرات غير المؤكدة
+_DELETED = object()
+
+def _matches(row, criteria):
+    return all(row.get(k) in _values(v) for k, v in criteria.items())
+
+
+class MemoryStore:
+    """
+    مخزن بيانات في الذاكرة بنفس جداول models.py، مع فهارس hash على id والحقول الأكثر استخداماً،
+    وحفظ نسخة كاملة (snapshot) بصيغة JSON على القرص.
+    """
+
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+        self.lock = threading.RLock()
+        self.tables = {entity: {} for entity in ENTITIES}
+        self.indexes = {entity: {cols: {} for cols in INDEXES.get(entity, [])} for entity in ENTITIES}
+        self.sequences = {entity: 0 for entity in ENTITIES}
+        self._last_snapshot = 0.0
+        self._dirty = False
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load_snapshot()
+        if snapshot_path:
+            # حفظ آخر التغييرات عند إيقاف الخادم
+            atexit.register(self.save_snapshot, True)
+
+    # --- الفهارس ---
+
+    def _index_add(self, entity, row):
+        for cols, index in self.indexes[entity].items():
+            index.setdefault(tuple(row.get(c) for c in cols), set()).add(row["id"])
+
+    def _index_remove(self, entity, row):
+        for cols, index in self.indexes[entity].items():
+            key = tuple(row.get(c) for c in cols)
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(row["id"])
+                if not ids:
+                    del index[key]
+
+    def _check_unique(self, entity, row):
+        for cols, index in self.indexes[entity].items():
+            if (entity, cols) not in UNIQUE_INDEXES:
+                continue
+            key = tuple(row.get(c) for c in cols)
+            if index.get(key, set()) - {row["id"]}:
+                raise _duplicate_error(key, cols)
+
+    def candidates(self, entity, criteria):
+        """يعيد معرفات الصفوف المرشحة باستخدام أفضل فهرس متاح، أو None إذا لزم المرور على الجدول كاملاً"""
+        if "id" in criteria:
+            return {i for i in _values(criteria["id"]) if i in self.tables[entity]}
+        best = None
+        for cols, index in self.indexes[entity].items():
+            if all(c in criteria for c in cols) and (best is None or len(cols) > len(best[0])):
+                best = (cols, index)
+        if best is None:
+            return None
+        cols, index = best
+        ids = set()
+        for key in itertools.product(*(_values(criteria[c]) for c in cols)):
+            ids.update(index.get(key, ()))
+        return ids
+
+    def put(self, entity, row):
+        """يضيف أو يستبدل صفاً، ويعيد الصف السابق (أو None)"""
+        table = self.tables[entity]
+        self._check_unique(entity, row)
+        previous = table.get(row["id"])
+        if previous is not None:
+            self._index_remove(entity, previous)
+        table[row["id"]] = row
+        self._index_add(entity, row)
+        if isinstance(row["id"], int):
+            self.sequences[entity] = max(self.sequences[entity], row["id"])
+        self._dirty = True
+        return previous
+
+    def remove(self, entity, id):
+        row = self.tables[entity].pop(id, None)
+        if row is not None:
+            self._index_remove(entity, row)
+            self._dirty = True
+        return row
+
+    def next_id(self, entity):
+        self.sequences[entity] += 1
+        return self.sequences[entity]
+
+    # --- الحفظ على القرص ---
+
+    def save_snapshot(self, force=False):
+        if not self.snapshot_path:
+            return
+        with self.lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_snapshot < SNAPSHOT_INTERVAL):
+                return
+            data = {entity: list(table.values()) for entity, table in self.tables.items()}
+            self._dirty = False
+            self._last_snapshot = time.monotonic()
+        # الكتابة في ملف مؤقت ثم الاستبدال حتى لا يتلف الملف عند انقطاع مفاجئ
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def load_snapshot(self):
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            data = json.load(f)
+        with self.lock:
+            for entity, rows in data.items():
+                if entity not in self.tables:
+                    continue
+                for row in rows:
+                    self.put(entity, row)
+            self._dirty = False
+
+
+class MemoryRepository(Repository):
+    """
+    محرك التخزين في الذاكرة بنفس سلوك SQLRepository.
+    التغييرات تُحفظ داخل المستودع (لا تراها الطلبات الأخرى) وتُطبق كلها دفعة واحدة
+    تحت قفل المخزن عند commit، و rollback يتجاهلها فقط دون لمس المخزن.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._reset()
+
+    def _reset(self):
+        self._ops = []  # ("insert" | "update" | "delete", entity, id, row or fields) بالترتيب
+        self._pending = {}  # (entity, id) -> الصف كما تراه هذه الجلسة، أو _DELETED
+
+    def _copy(self, row, fields=None):
+        if fields:
+            return {f: row.get(f) for f in fields}
+        return dict(row)
+
+    def _match(self, entity, criteria):
+        store = self.store
+        with store.lock:
+            ids = store.candidates(entity, criteria)
+            table = store.tables[entity]
+            rows = table.values() if ids is None else (table[i] for i in ids if i in table)
+            # صفوف المخزن لا تُعدل في مكانها (put يستبدلها)، فيكفي نسخ المراجع تحت القفل
+            found = {row["id"]: row for row in rows}
+        # التغييرات غير المؤكدة لهذه الجلسة تظهر لها فقط
+        for (pending_entity, id), row in self._pending.items():
+            if pending_entity != entity:
+                continue
+            found.pop(id, None)
+            if row is not _DELETED:
+                found[id] = row
+        return [row for row in found.values() if _matches(row, criteria)]
+
+    def _check_unique(self, entity, row):
+        for unique_entity, cols in UNIQUE_INDEXES:
+            if unique_entity != entity:
+                continue
+            others = self._match(entity, {c: row.get(c) for c in cols})
+            if any(other["id"] != row["id"] for other in others):
+                raise _duplicate_error(tuple(row.get(c) for c in cols), cols)
+
+    def get(self, entity, id, fields=None):
+        row = self._pending.get((entity, id))
+        if row is None:
+            with self.store.lock:
+                row = self.store.tables[entity].get(id)
+        if row is None or row is _DELETED:
+            return None
+        return self._copy(row, fields)
+
+    def all(self, entity, fields=None):
+        return [self._copy(row, fields) for row in self._match(entity, {})]
+
+    def find(self, entity, **criteria):
+        return [dict(row) for row in self._match(entity, criteria)]
+
+    def insert(self, entity, row):
+        row = {**dict.fromkeys(column_names(entity)), **column_defaults(entity), **row}
+        if row.get("id") is None:
+            with self.store.lock:
+                row["id"] = self.store.next_id(entity)
+        if self.get(entity, row["id"]) is not None:
+            raise _duplicate_error((row["id"],), ("PRIMARY",))
+        self._check_unique(entity, row)
+        self._pending[(entity, row["id"])] = row
+        self._ops.append(("insert", entity, row["id"], row))
+        return dict(row)
+
+    def update_where(self, entity, criteria, fields):
+        rows = self._match(entity, criteria)
+        for row in rows:
+            updated = {**row, **fields}
+            self._check_unique(entity, updated)
+            self._pending[(entity, row["id"])] = updated
+            # تُحفظ الحقول المعدلة فقط حتى لا يُلغى تعديل جلسة أخرى على باقي الحقول (مثل UPDATE)
+            self._ops.append(("update", entity, row["id"], dict(fields)))
+        return len(rows)
+
+    def _delete(self, entity, criteria, counts):
+        rows = self._match(entity, criteria)
+        for row in rows:
+            self._pending[(entity, row["id"])] = _DELETED
+            self._ops.append(("delete", entity, row["id"], None))
+        counts[entity] = counts.get(entity, 0) + len(rows)
+        if rows:
+            # نفس قواعد ON DELETE المعرفة في models.py
+            ids = [row["id"] for row in rows]
+            for child, field, ondelete in cascades(entity):
+                if ondelete == "CASCADE":
+                    self._delete(child, {field: ids}, counts)
+                elif ondelete == "SET NULL":
+                    self.update_where(child, {field: ids}, {field: None})
+
+    def delete_where(self, entity, **criteria):
+        return self.delete_many(entity, **criteria)[entity]
+
+    def delete_many(self, entity, **criteria):
+        counts = {entity: 0}
+        self._delete(entity, criteria, counts)
+        return counts
+
+    def commit(self):
+        store = self.store
+        with store.lock:
+            undo = []  # (entity, id, previous row) لإلغاء ما طُبق إذا فشل جزء من commit
+            try:
+                for op, entity, id, data in self._ops:
+                    table = store.tables[entity]
+                    if op == "insert":
+                        if id in table:
+                            raise _duplicate_error((id,), ("PRIMARY",))
+                        undo.append((entity, id, store.put(entity, dict(data))))
+                    elif op == "update":
+                        current = table.get(id)
+                        if current is not None:  # حذفته جلسة أخرى: لا شيء لتحديثه (مثل SQL)
+                            undo.append((entity, id, store.put(entity, {**current, **data})))
+                    else:
+                        undo.append((entity, id, store.remove(entity, id)))
+            except Exception:
+                for entity, id, previous in reversed(undo):
+                    store.remove(entity, id)
+                    if previous is not None:
+                        store.put(entity, previous)
+                self._reset()
+                raise
+        self._reset()
+        store.save_snapshot()
+
+    def rollback(self):
+        self._reset()
+
+    def close(self):
+        # مثل جلسة SQLAlchemy: أي تغيير لم يتم تأكيده يُلغى عند الإغلاق
+        self._reset()
@@ -0,0 +1,162 @@
+import os, sys
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from app.database import Base
+
+# الصفوف اليتيمة (تشير إلى صفوف محذوفة) تمنع إضافة المفتاح. حذفها أو تفريغ مفتاحها يغير البيانات،
+# لذلك لا يتم إلا بطلب صريح: MIGRATION_CLEAN_ORPHANS=1 أو python -m app.migrations --clean-orphans
+CLEAN_ORPHANS = os.environ.get("MIGRATION_CLEAN_ORPHANS", "").lower() in ("1", "true", "yes")
+
+
+def _expected_rules():
+    """[(table, fk)] لكل مفتاح أجنبي له قاعدة ON DELETE في models.py"""
+    return [
+        (table, fk)
+        for table in Base.metadata.sorted_tables
+        for fk in table.foreign_keys
+        if fk.ondelete
+    ]
+
+
+def _reflected_rule(inspector, table, fk):
+    """يعيد (المفتاح الموجود في القاعدة أو None، هل قاعدة ON DELETE مطابقة)"""
+    for existing in inspector.get_foreign_keys(table.name):
+        if existing["constrained_columns"] == [fk.parent.name] and existing["referred_table"] == fk.column.table.name:
+            ondelete = (existing.get("options") or {}).get("ondelete") or ""
+            return existing, ondelete.upper() == fk.ondelete.upper()
+    return None, False
+
+
+def missing_rules(engine):
+    inspector = inspect(engine)
+    missing = []
+    for table, fk in _expected_rules():
+        if not inspector.has_table(table.name):
+            continue
+        existing, matches = _reflected_rule(inspector, table, fk)
+        if not matches:
+            missing.append((table, fk, existing))
+    return missing
+
+
+def _orphans(quote, fk):
+    column, parent = quote(fk.parent.name), fk.column.table
+    return (
+        f"{column} IS NOT NULL AND {column} NOT IN "
+        f"(SELECT {quote(fk.column.name)} FROM {quote(parent.name)})"
+    )
+
+
+def count_orphans(engine, tables):
+    """{(table, fk): عدد الصفوف اليتيمة} لكل مفتاح له قاعدة ON DELETE في الجداول المعطاة"""
+    quote = engine.dialect.identifier_preparer.quote
+    counts = {}
+    with engine.connect() as conn:
+        for table in tables:
+            for fk in table.foreign_keys:
+                if not fk.ondelete:
+                    continue
+                count = conn.execute(text(f"SELECT COUNT(*) FROM {quote(table.name)} WHERE {_orphans(quote, fk)}")).scalar()
+                if count:
+                    counts[(table, fk)] = count
+    return counts
+
+
+def _clean_orphans(execute, quote, orphans):
+    # نطبق على الصفوف اليتيمة نفس القاعدة التي كانت ستطبقها القاعدة عند حذف الصف الأصلي
+    for (table, fk), count in orphans.items():
+        target = f"{table.name}.{fk.parent.name}"
+        if fk.ondelete.upper() == "CASCADE":
+            print(f"MIGRATION: deleting {count} orphan rows from {target}")
+            execute(f"DELETE FROM {quote(table.name)} WHERE {_orphans(quote, fk)}")
+        else:
+            print(f"MIGRATION: setting {target} to NULL on {count} orphan rows")
+            execute(f"UPDATE {quote(table.name)} SET {quote(fk.parent.name)} = NULL WHERE {_orphans(quote, fk)}")
+
+
+def _alter_foreign_keys(engine, missing, orphans):
+    quote = engine.dialect.identifier_preparer.quote
+    drop = "DROP FOREIGN KEY" if engine.dialect.name == "mysql" else "DROP CONSTRAINT"
+    with engine.begin() as conn:
+        execute = lambda sql: conn.execute(text(sql))
+        _clean_orphans(execute, quote, orphans)
+        for table, fk, existing in missing:
+            rule = fk.ondelete.upper()
+            name = f"fk_{table.name}_{fk.parent.name}_{rule.replace(' ', '_').lower()}"
+            # الحذف والإضافة في جملة ALTER واحدة: في MySQL كل جملة DDL تُنفذ وتُثبت وحدها،
+            # فلو فشلت الإضافة في جملة منفصلة لبقي الجدول بدون أي مفتاح
+            actions = [f"{drop} {quote(existing['name'])}"] if existing and existing.get("name") else []
+            actions.append(
+                f"ADD CONSTRAINT {quote(name)} FOREIGN KEY ({quote(fk.parent.name)}) "
+                f"REFERENCES {quote(fk.column.table.name)} ({quote(fk.column.name)}) ON DELETE {rule}"
+            )
+            execute(f"ALTER TABLE {quote(table.name)} {', '.join(actions)}")
+
+
+def _rebuild_sqlite_tables(engine, missing, orphans):
+    # SQLite لا يدعم تعديل المفاتيح الأجنبية، فيُعاد إنشاء الجدول ونسخ بياناته
+    quote = engine.dialect.identifier_preparer.quote
+    inspector = inspect(engine)
+    tables = {table.name: table for table, fk, existing in missing}
+    raw = engine.raw_connection()
+    cursor = raw.cursor()
+    try:
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        cursor.execute("PRAGMA legacy_alter_table=ON")
+        cursor.execute("BEGIN")
+        for name, table in tables.items():
+            old_name = f"{name}_before_migration"
+            columns = [c["name"] for c in inspector.get_columns(name) if c["name"] in table.columns]
+            column_list = ", ".join(quote(c) for c in columns)
+            for index in inspector.get_indexes(name):
+                cursor.execute(f"DROP INDEX IF EXISTS {quote(index['name'])}")
+            cursor.execute(f"ALTER TABLE {quote(name)} RENAME TO {quote(old_name)}")
+            cursor.execute(str(CreateTable(table).compile(dialect=engine.dialect)))
+            cursor.execute(f"INSERT INTO {quote(name)} ({column_list}) SELECT {column_list} FROM {quote(old_name)}")
+            cursor.execute(f"DROP TABLE {quote(old_name)}")
+            for index in table.indexes:
+                cursor.execute(str(CreateIndex(index).compile(dialect=engine.dialect)))
+        _clean_orphans(cursor.execute, quote, orphans)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        cursor.execute("PRAGMA legacy_alter_table=OFF")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        raw.close()
+
+
+def apply_on_delete_rules(engine, clean_orphans=CLEAN_ORPHANS):
+    """
+    create_all لا يعدل المفاتيح الأجنبية للجداول الموجودة مسبقاً، لذلك عند بدء التطبيق
+    تُقارن قواعد ON DELETE في القاعدة بما في models.py وتُعاد إضافة المفاتيح المختلفة.
+    آمنة للتشغيل في كل مرة (لا تفعل شيئاً إذا كانت القواعد مطبقة). الجداول التي فيها صفوف يتيمة
+    تُترك كما هي (مع طباعة عددها) ما لم يكن clean_orphans مفعلاً. تعيد True إذا أصبحت كل القواعد مطبقة.
+    """
+    missing = missing_rules(engine)
+    if not missing:
+        return True
+    orphans = count_orphans(engine, {table for table, fk, existing in missing})
+    for (table, fk), count in orphans.items():
+        print(f"WARNING: {count} rows in {table.name}.{fk.parent.name} reference missing {fk.column.table.name} rows")
+    if orphans and not clean_orphans:
+        skipped = {table for table, fk in orphans}
+        print(
+            f"WARNING: ON DELETE rules not applied to {', '.join(sorted(t.name for t in skipped))}; "
+            "run `python -m app.migrations --clean-orphans` to clean these rows and migrate"
+        )
+        missing = [m for m in missing if m[0] not in skipped]
+        orphans = {}
+    if missing:
+        if engine.dialect.name == "sqlite":
+            _rebuild_sqlite_tables(engine, missing, orphans)
+        else:
+            _alter_foreign_keys(engine, missing, orphans)
+    return not missing_rules(engine)
+
+
+if __name__ == "__main__":
+    # خطوة ترحيل صريحة: python -m app.migrations [--clean-orphans]
+    from app import database, models
+    sys.exit(0 if apply_on_delete_rules(database.engine, clean_orphans="--clean-orphans" in sys.argv) else 1)
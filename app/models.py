@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, JSON, BigInteger
-from .database import Base, engine
+from .database import Base
 from passlib.context import CryptContext
 
 # لإدارة كلمات المرور
@@ -27,7 +27,7 @@ class Lesson(Base):
     title = Column(String(255))
     description = Column(Text)
     class_ = Column('class', String(50))
-    moduleId = Column(String(255), ForeignKey("modules.id"), nullable=True)
+    moduleId = Column(String(255), ForeignKey("modules.id", ondelete="SET NULL"), nullable=True)
     order = Column(Integer, default=0)
     isVisible = Column(Boolean, default=True)
     slides = Column(JSON) # Storing slides as JSON
@@ -57,8 +57,8 @@ class Exam(Base):
 class Result(Base):
     __tablename__ = "results"
     id = Column(String(255), primary_key=True, index=True)
-    userId = Column(String(255), ForeignKey("users.id"))
-    examId = Column(String(255), ForeignKey("exams.id"))
+    userId = Column(String(255), ForeignKey("users.id", ondelete="CASCADE"))
+    examId = Column(String(255), ForeignKey("exams.id", ondelete="CASCADE"))
     score = Column(Integer)
     total = Column(Integer)
     at = Column(BigInteger)
@@ -67,12 +67,12 @@ class Result(Base):
 class StudentSchedule(Base):
     __tablename__ = "student_schedules"
     id = Column(Integer, primary_key=True, index=True)
-    studentId = Column(String(255), ForeignKey("users.id"))
+    studentId = Column(String(255), ForeignKey("users.id", ondelete="CASCADE"))
     day = Column(String(50))
     time = Column(String(50))
     subject = Column(String(255))
     teacher = Column(String(255), nullable=True)
 
-# This line ensures that if the tables don't exist, they are created.
+# Tables are created by repository.init_storage() when the SQL backend starts.
 # If they exist but columns are missing, you might need to manually alter the table in the database.
-Base.metadata.create_all(bind=engine)
+# Existing foreign keys get their ON DELETE rules from migrations.apply_on_delete_rules().
@@ -0,0 +1,256 @@
+from sqlalchemy import inspect, select
+from sqlalchemy.exc import IntegrityError
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+import os
+from app import models, database, migrations
+
+# محرك التخزين: "sql" (الافتراضي، عبر SQLAlchemy) أو "memory" (في الذاكرة للتجربة والاختبارات)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sql").lower()
+
+# ملف حفظ نسخة من بيانات محرك الذاكرة على القرص (اختياري)
+MEMORY_SNAPSHOT_PATH = os.environ.get("MEMORY_SNAPSHOT_PATH")
+
+# أسماء الجداول كما تستخدمها نقاط النهاية
+ENTITIES = {
+    "users": models.User,
+    "lessons": models.Lesson,
+    "modules": models.Module,
+    "exams": models.Exam,
+    "results": models.Result,
+    "student_schedules": models.StudentSchedule,
+}
+
+# نصوص أخطاء تكرار المفتاح الفريد في قواعد البيانات المدعومة (MySQL، SQLite، PostgreSQL)
+_DUPLICATE_MESSAGES = ("Duplicate entry", "UNIQUE constraint failed", "duplicate key value")
+
+
+class DuplicateError(ValueError):
+    """قيمة مكررة في عمود فريد (مثل البريد الإلكتروني)؛ يرفعها المحركان بنفس الشكل"""
+
+
+@lru_cache(maxsize=None)
+def _column_defaults(entity):
+    """القيم الافتراضية للأعمدة (role, isActive, order...) حسب تعريفها في models.py"""
+    defaults = {}
+    for attr in inspect(ENTITIES[entity]).column_attrs:
+        default = attr.columns[0].default
+        if default is not None and default.is_scalar:
+            defaults[attr.key] = default.arg
+    return defaults
+
+def column_defaults(entity):
+    return dict(_column_defaults(entity))
+
+@lru_cache(maxsize=None)
+def column_names(entity):
+    return tuple(attr.key for attr in inspect(ENTITIES[entity]).column_attrs)
+
+@lru_cache(maxsize=None)
+def cascades(entity):
+    """
+    قواعد ON DELETE المعرفة في models.py للجداول التي تشير إلى هذا الجدول:
+    [(child entity, foreign key field, "CASCADE" أو "SET NULL")]
+    """
+    table = ENTITIES[entity].__table__
+    rules = []
+    for child, model in ENTITIES.items():
+        for attr in inspect(model).column_attrs:
+            for fk in attr.columns[0].foreign_keys:
+                if fk.ondelete and fk.column.table is table:
+                    rules.append((child, attr.key, fk.ondelete.upper()))
+    return tuple(rules)
+
+
+class Repository(ABC):
+    """
+    واجهة موحدة للتخزين تستخدمها نقاط النهاية بغض النظر عن المحرك.
+    الصفوف تُعاد كقواميس بأسماء الحقول كما في models.py (مثل class_).
+    في شروط البحث، القيمة من نوع list/tuple/set تعني "أحد هذه القيم" (IN).
+    """
+
+    @abstractmethod
+    def get(self, entity, id, fields=None):
+        ...
+
+    @abstractmethod
+    def all(self, entity, fields=None):
+        ...
+
+    @abstractmethod
+    def find(self, entity, **criteria):
+        ...
+
+    def find_one(self, entity, **criteria):
+        rows = self.find(entity, **criteria)
+        return rows[0] if rows else None
+
+    @abstractmethod
+    def insert(self, entity, row):
+        ...
+
+    def update(self, entity, id, fields):
+        """يحدث صفاً واحداً، ويعيد True إذا كان موجوداً"""
+        return self.update_where(entity, {"id": id}, fields) > 0
+
+    @abstractmethod
+    def update_where(self, entity, criteria, fields):
+        ...
+
+    def delete(self, entity, id):
+        return self.delete_where(entity, id=id)
+
+    @abstractmethod
+    def delete_where(self, entity, **criteria):
+        """يحذف الصفوف المطابقة (مع تطبيق قواعد ON DELETE) ويعيد عددها"""
+        ...
+
+    @abstractmethod
+    def delete_many(self, entity, **criteria):
+        """مثل delete_where لكن يعيد عدد الصفوف المحذوفة من كل جدول، بما فيها المحذوفة بالتتابع"""
+        ...
+
+    @abstractmethod
+    def commit(self):
+        ...
+
+    @abstractmethod
+    def rollback(self):
+        ...
+
+    def close(self):
+        pass
+
+
+class SQLRepository(Repository):
+    """المحرك الأساسي: SQLAlchemy فوق MySQL (أو أي قاعدة يدعمها)"""
+
+    def __init__(self, db):
+        self.db = db
+
+    @contextmanager
+    def _duplicates(self):
+        # تحويل خطأ القاعدة (الذي يختلف نصه حسب نوعها) إلى DuplicateError
+        try:
+            yield
+        except IntegrityError as e:
+            if any(message in str(e.orig) for message in _DUPLICATE_MESSAGES):
+                raise DuplicateError(str(e.orig)) from e
+            raise
+
+    def _to_dict(self, entity, obj):
+        return {key: getattr(obj, key) for key in column_names(entity)}
+
+    def _filters(self, entity, criteria):
+        model = ENTITIES[entity]
+        return [
+            getattr(model, key).in_(value) if isinstance(value, (list, tuple, set)) else getattr(model, key) == value
+            for key, value in criteria.items()
+        ]
+
+    def _count_cascade(self, entity, ids, counts):
+        # عدّ الصفوف التي ستحذفها القاعدة بالتتابع، باستعلام COUNT واحد لكل جدول
+        for child, field, ondelete in cascades(entity):
+            if ondelete != "CASCADE":
+                continue
+            model = ENTITIES[child]
+            condition = getattr(model, field).in_(ids)
+            counts[child] = counts.get(child, 0) + self.db.query(model).filter(condition).count()
+            self._count_cascade(child, select(model.id).where(condition), counts)
+
+    def get(self, entity, id, fields=None):
+        model = ENTITIES[entity]
+        if fields:
+            # جلب الأعمدة المطلوبة فقط (مثل slides) بدون تحميل الصف كاملاً
+            row = self.db.query(*[getattr(model, f) for f in fields]).filter(model.id == id).first()
+            return dict(zip(fields, row)) if row else None
+        obj = self.db.query(model).filter(model.id == id).first()
+        return self._to_dict(entity, obj) if obj else None
+
+    def all(self, entity, fields=None):
+        model = ENTITIES[entity]
+        if fields:
+            # الأعمدة المطلوبة فقط (مثل id و class_ للمستخدمين بدون كلمات المرور)
+            return [dict(zip(fields, row)) for row in self.db.query(*[getattr(model, f) for f in fields]).all()]
+        return [self._to_dict(entity, obj) for obj in self.db.query(model).all()]
+
+    def find(self, entity, **criteria):
+        query = self.db.query(ENTITIES[entity]).filter(*self._filters(entity, criteria))
+        return [self._to_dict(entity, obj) for obj in query.all()]
+
+    def insert(self, entity, row):
+        row = {**column_defaults(entity), **row}
+        obj = ENTITIES[entity](**row)
+        self.db.add(obj)
+        with self._duplicates():
+            self.db.flush()  # لتعبئة المعرفات التلقائية (مثل id في student_schedules)
+        return self._to_dict(entity, obj)
+
+    def update_where(self, entity, criteria, fields):
+        query = self.db.query(ENTITIES[entity]).filter(*self._filters(entity, criteria))
+        with self._duplicates():
+            return query.update(fields, synchronize_session=False)
+
+    def _delete_children(self, entity, ids):
+        # بديل ON DELETE قبل تطبيق الترحيل: جملة واحدة لكل جدول مرتبط، من الأعمق للأعلى
+        for child, field, ondelete in cascades(entity):
+            model = ENTITIES[child]
+            condition = getattr(model, field).in_(ids)
+            if ondelete == "CASCADE":
+                self._delete_children(child, select(model.id).where(condition))
+                self.db.query(model).filter(condition).delete(synchronize_session=False)
+            else:
+                self.db.query(model).filter(condition).update({field: None}, synchronize_session=False)
+
+    def delete_where(self, entity, **criteria):
+        # جملة DELETE واحدة؛ الصفوف المرتبطة تحذفها القاعدة نفسها (ON DELETE)
+        filters = self._filters(entity, criteria)
+        if not _schema_cascades:
+            self._delete_children(entity, select(ENTITIES[entity].id).where(*filters))
+        query = self.db.query(ENTITIES[entity]).filter(*filters)
+        return query.delete(synchronize_session=False)
+
+    def delete_many(self, entity, **criteria):
+        filters = self._filters(entity, criteria)
+        counts = {entity: 0}
+        self._count_cascade(entity, select(ENTITIES[entity].id).where(*filters), counts)
+        counts[entity] = self.delete_where(entity, **criteria)
+        return counts
+
+    def commit(self):
+        with self._duplicates():
+            self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        self.db.close()
+
+
+_memory_store = None
+
+# هل تطبق القاعدة قواعد ON DELETE بنفسها؟ حتى ينجح الترحيل تحذف delete_where الصفوف المرتبطة صراحة
+_schema_cascades = False
+
+def init_storage():
+    """ينشئ الجداول ويطبق ترحيل ON DELETE (SQL) أو يحمّل مخزن الذاكرة عند بدء التطبيق"""
+    global _memory_store, _schema_cascades
+    if STORAGE_BACKEND == "memory":
+        from app.memory import MemoryStore
+        _memory_store = MemoryStore(MEMORY_SNAPSHOT_PATH)
+    else:
+        models.Base.metadata.create_all(bind=database.engine)
+        try:
+            _schema_cascades = migrations.apply_on_delete_rules(database.engine)
+        except Exception as e:
+            print(f"WARNING: ON DELETE migration failed, deleting related rows explicitly: {e}")
+
+def open_repository(read_only=False, client_key=None):
+    if _memory_store is not None:
+        from app.memory import MemoryRepository
+        return MemoryRepository(_memory_store)
+    if read_only:
+        return SQLRepository(database.router.read_session(client_key))
+    return SQLRepository(database.router.write_session(client_key))
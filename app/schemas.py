@@ -36,6 +36,15 @@ class LessonSave(BaseModel):
 class DeleteItem(BaseModel):
     id: str
 
+# Schema لحذف فصل دراسي كامل (طلابه ونتائجهم وجداولهم)
+class ClassDelete(BaseModel):
+    class_: str
+
+# Schema لإنهاء امتحانات فصل دراسي (بالمعرفات أو بالصف)
+class ExamsRetire(BaseModel):
+    ids: Optional[List[str]] = None
+    class_: Optional[str] = None
+
 # Schema لحفظ وتعديل الوحدة
 class ModuleSave(BaseModel):
     id: Optional[str] = None
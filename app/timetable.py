@@ -0,0 +1,193 @@
+import os, threading, time
+from collections import Counter
+from app import repository
+
+# بعد هذه المدة (بالثواني) يُعاد بناء الجداول من قاعدة البيانات، احتياطاً لأي تعديل
+# تم من عملية أخرى (عدة workers) أو مباشرة في phpMyAdmin
+TIMETABLE_TTL = float(os.environ.get("TIMETABLE_TTL", "300"))
+
+
+def _entry(row):
+    return {"day": row["day"], "time": row["time"], "subject": row["subject"], "teacher": row["teacher"]}
+
+
+class Timetable:
+    """
+    جداول الحصص محسوبة مسبقاً في الذاكرة:
+    - جدول كل طالب: studentId -> day -> time -> الحصة
+    - جدول كل صف: class -> day -> time -> عدد الطلاب لكل (subject, teacher)
+    - فهرس المعلمين: (teacher, day, time) -> عدد الحصص لكل (class, subject)، ومنه تعارضات المعلمين
+    تُبنى مرة واحدة من القاعدة الأساسية (وليس من replica قد تكون متأخرة) ثم تُحدَّث مع كل حفظ أو حذف.
+    """
+
+    def __init__(self, ttl=TIMETABLE_TTL):
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.loaded_at = None
+        self.students = {}
+        self.student_class = {}
+        self.classes = {}
+        self.teacher_slots = {}
+        self.conflicts = set()
+
+    # --- البناء ---
+
+    def ensure_loaded(self):
+        with self.lock:
+            if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+                return
+            db = repository.open_repository()
+            try:
+                # id و class_ فقط؛ لا حاجة لتحميل كلمات المرور المشفرة
+                users = db.all("users", fields=["id", "class_"])
+                rows = db.all("student_schedules")
+            finally:
+                db.close()
+            self.students, self.classes, self.teacher_slots, self.conflicts = {}, {}, {}, set()
+            self.student_class = {user["id"]: user["class_"] for user in users}
+            for row in rows:
+                self._add(row["studentId"], _entry(row))
+            self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    # --- الفهارس ---
+
+    def _index(self, student_id, entry, delta):
+        class_ = self.student_class.get(student_id)
+        day, time_, subject, teacher = entry["day"], entry["time"], entry["subject"], entry["teacher"]
+
+        slot = self.classes.setdefault(class_, {}).setdefault(day, {}).setdefault(time_, Counter())
+        slot[(subject, teacher)] += delta
+        if slot[(subject, teacher)] <= 0:
+            del slot[(subject, teacher)]
+
+        if teacher:
+            key = (teacher, day, time_)
+            bookings = self.teacher_slots.setdefault(key, Counter())
+            bookings[(class_, subject)] += delta
+            if bookings[(class_, subject)] <= 0:
+                del bookings[(class_, subject)]
+            # نفس المعلم في نفس الوقت لأكثر من صف أو مادة
+            if len(bookings) > 1:
+                self.conflicts.add(key)
+            else:
+                self.conflicts.discard(key)
+                if not bookings:
+                    del self.teacher_slots[key]
+
+    def _add(self, student_id, entry):
+        days = self.students.setdefault(student_id, {})
+        previous = days.setdefault(entry["day"], {}).get(entry["time"])
+        if previous is not None:
+            self._index(student_id, previous, -1)
+        days[entry["day"]][entry["time"]] = entry
+        self._index(student_id, entry, +1)
+
+    def _remove(self, student_id, day, time_):
+        slots = self.students.get(student_id, {}).get(day, {})
+        entry = slots.pop(time_, None)
+        if entry is not None:
+            self._index(student_id, entry, -1)
+            if not slots:
+                del self.students[student_id][day]
+
+    # --- التحديث التدريجي (بعد نجاح commit) ---
+
+    def _refresh_slot(self, student_id, day, time_):
+        """
+        يعيد قراءة الحصة من القاعدة الأساسية داخل القفل بدلاً من تطبيق ما أرسله الطلب، فإذا حُفظت
+        نفس الحصة من طلبين متزامنين يبقى في الذاكرة آخر ما تم commit له مهما كان ترتيب التحديثات.
+        """
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            db = repository.open_repository()
+            try:
+                row = db.find_one("student_schedules", studentId=student_id, day=day, time=time_)
+                if row is not None and student_id not in self.student_class:
+                    student = db.get("users", student_id, fields=["class_"])
+                    self.student_class[student_id] = student["class_"] if student else None
+            finally:
+                db.close()
+            if row is None:
+                self._remove(student_id, day, time_)
+            else:
+                self._add(student_id, _entry(row))
+
+    def save_entry(self, row):
+        self._refresh_slot(row["studentId"], row["day"], row["time"])
+
+    def delete_entry(self, student_id, day, time_):
+        self._refresh_slot(student_id, day, time_)
+
+    def set_student_class(self, student_id, class_):
+        """عند إضافة طالب أو نقله لصف آخر: تُنقل حصصه إلى جدول الصف الجديد"""
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            entries = [e for slots in self.students.get(student_id, {}).values() for e in slots.values()]
+            for entry in entries:
+                self._index(student_id, entry, -1)
+            self.student_class[student_id] = class_
+            for entry in entries:
+                self._index(student_id, entry, +1)
+
+    def remove_student(self, student_id):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            for day, slots in list(self.students.get(student_id, {}).items()):
+                for time_ in list(slots):
+                    self._remove(student_id, day, time_)
+            self.students.pop(student_id, None)
+            self.student_class.pop(student_id, None)
+
+    # --- الاستعلامات ---
+
+    def student_schedule(self, student_id):
+        self.ensure_loaded()
+        with self.lock:
+            return {day: list(slots.values()) for day, slots in self.students.get(student_id, {}).items()}
+
+    def all_student_schedules(self):
+        """نفس شكل studentSchedules في load_data: studentId -> day -> [الحصص]"""
+        self.ensure_loaded()
+        with self.lock:
+            return {
+                student_id: {day: list(slots.values()) for day, slots in days.items()}
+                for student_id, days in self.students.items() if days
+            }
+
+    def class_schedule(self, class_):
+        self.ensure_loaded()
+        with self.lock:
+            grid = {}
+            for day, times in self.classes.get(class_, {}).items():
+                for time_, slot in times.items():
+                    if slot:
+                        grid.setdefault(day, {})[time_] = [
+                            {"subject": subject, "teacher": teacher, "students": count}
+                            for (subject, teacher), count in slot.items()
+                        ]
+            return grid
+
+    def teacher_conflicts(self, teacher=None):
+        self.ensure_loaded()
+        with self.lock:
+            return [
+                {
+                    "teacher": key[0], "day": key[1], "time": key[2],
+                    "bookings": [
+                        {"class_": class_, "subject": subject, "students": count}
+                        for (class_, subject), count in self.teacher_slots[key].items()
+                    ],
+                }
+                for key in sorted(self.conflicts, key=lambda k: tuple(str(part) for part in k))
+                if teacher is None or key[0] == teacher
+            ]
+
+
+schedules = Timetable()
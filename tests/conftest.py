@@ -0,0 +1,4 @@
+import os
+
+# لا نحتاج MySQL أثناء الاختبارات؛ القاعدة الافتراضية ملف SQLite في الذاكرة
+os.environ.setdefault("DATABASE_URL", "sqlite://")
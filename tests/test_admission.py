@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+from app import admission
+from app.admission import AdmissionController, AdmissionMiddleware, Rejected, RouteGroup
+
+
+def make_controller(global_limit=1, max_queued=100, **overrides):
+    settings = {
+        "high": dict(priority=0, limit=1, max_queue=10, timeout=5.0, paths=["/high"]),
+        "low": dict(priority=1, limit=1, max_queue=10, timeout=5.0, paths=["/low"]),
+    }
+    for name, values in overrides.items():
+        settings[name].update(values)
+    groups = [RouteGroup(name, **values) for name, values in settings.items()]
+    controller = AdmissionController(groups, global_limit=global_limit, max_queued=max_queued)
+    return controller, controller.classify("/high"), controller.classify("/low")
+
+
+async def settle():
+    # يسمح للمهام المنتظرة بالوصول إلى الطابور أو باستلام نتيجتها
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_freed_slot_goes_to_highest_priority_waiter():
+    async def run():
+        controller, high, low = make_controller()
+        await controller.acquire(low)
+        order = []
+
+        async def wait(group, name):
+            await controller.acquire(group)
+            order.append(name)
+
+        waiters = [asyncio.ensure_future(wait(low, "low")), asyncio.ensure_future(wait(high, "high"))]
+        await settle()
+        assert (low.waiting(), high.waiting()) == (1, 1)
+        controller.release(low)
+        await settle()
+        assert order == ["high"]
+        controller.release(high)
+        await settle()
+        assert order == ["high", "low"]
+        await asyncio.gather(*waiters)
+        controller.release(low)
+        assert controller.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_full_group_queue_is_rejected_with_429():
+    async def run():
+        controller, high, low = make_controller(low=dict(max_queue=1))
+        await controller.acquire(low)
+        waiter = asyncio.ensure_future(controller.acquire(low))
+        await settle()
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(low)
+        assert (rejected.value.status, rejected.value.retry_after) == (429, 1)
+        assert low.rejected == 1
+        waiter.cancel()
+
+    asyncio.run(run())
+
+
+def test_newest_lowest_priority_waiter_is_shed_when_total_queue_is_full():
+    async def run():
+        controller, high, low = make_controller(max_queued=2)
+        await controller.acquire(low)
+        oldest = asyncio.ensure_future(controller.acquire(low))
+        newest = asyncio.ensure_future(controller.acquire(low))
+        await settle()
+
+        # طلب منخفض الأولوية لا يجد من هو أقل منه فيُرفض هو
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(low)
+        assert (rejected.value.status, rejected.value.retry_after) == (503, 5)
+
+        high_waiter = asyncio.ensure_future(controller.acquire(high))
+        await settle()
+        assert newest.done() and isinstance(newest.exception(), Rejected)
+        assert (newest.exception().status, newest.exception().retry_after) == (503, 5)
+        assert not oldest.done() and high.waiting() == 1
+        assert low.shed == 2
+
+        controller.release(low)
+        await settle()
+        assert high_waiter.done() and not oldest.done()
+        oldest.cancel()
+
+    asyncio.run(run())
+
+
+def test_waiter_past_deadline_gets_503_and_does_not_hold_a_slot():
+    async def run():
+        controller, high, low = make_controller(low=dict(timeout=0.05))
+        await controller.acquire(low)
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(low)
+        assert rejected.value.status == 503 and low.timed_out == 1
+        controller.release(low)
+        assert controller.in_flight == 0 and low.in_flight == 0
+        await controller.acquire(high)
+        assert controller.in_flight == 1
+
+    asyncio.run(run())
+
+
+def test_slot_granted_at_the_deadline_is_handed_back(monkeypatch):
+    controller, high, low = make_controller(low=dict(timeout=0.123))
+    wait_for = asyncio.wait_for
+
+    async def grant_then_time_out(future, timeout):
+        if timeout != 0.123:
+            return await wait_for(future, timeout)
+        # الطلب الجاري ينتهي ويُمنح مكانه للمنتظر في نفس لحظة انتهاء مهلته
+        controller.release(low)
+        assert future.done() and controller.in_flight == 1
+        raise asyncio.TimeoutError
+
+    async def run():
+        await controller.acquire(low)
+        monkeypatch.setattr(admission.asyncio, "wait_for", grant_then_time_out)
+        try:
+            with pytest.raises(Rejected):
+                await controller.acquire(low)
+        finally:
+            monkeypatch.setattr(admission.asyncio, "wait_for", wait_for)
+        assert controller.in_flight == 0 and low.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_snapshot_counters():
+    async def run():
+        controller, high, low = make_controller(global_limit=2, low=dict(max_queue=1))
+        await controller.acquire(high)
+        await controller.acquire(low)
+        waiter = asyncio.ensure_future(controller.acquire(low))
+        await settle()
+        with pytest.raises(Rejected):
+            await controller.acquire(low)
+        snapshot = controller.snapshot()
+        controller.release(high)
+        controller.release(low)
+        await waiter
+        controller.release(low)
+        return snapshot, controller.snapshot()
+
+    busy, idle = asyncio.run(run())
+    assert busy == {
+        "inFlight": 2, "limit": 2,
+        "groups": {
+            "high": {"priority": 0, "limit": 1, "inFlight": 1, "queued": 0, "admitted": 1,
+                     "rejected": 0, "shed": 0, "timedOut": 0},
+            "low": {"priority": 1, "limit": 1, "inFlight": 1, "queued": 1, "admitted": 1,
+                    "rejected": 1, "shed": 0, "timedOut": 0},
+        },
+    }
+    assert idle["inFlight"] == 0 and idle["groups"]["low"]["admitted"] == 2 and idle["groups"]["low"]["queued"] == 0
+
+
+@pytest.mark.parametrize("overrides, status, retry_after", [
+    (dict(low=dict(limit=0, max_queue=0)), 429, "1"),
+    (dict(max_queued=0, low=dict(limit=0)), 503, "5"),
+])
+def test_middleware_rejection_has_retry_after(overrides, status, retry_after):
+    max_queued = overrides.pop("max_queued", 100)
+    controller, high, low = make_controller(max_queued=max_queued, **overrides)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    client = TestClient(AdmissionMiddleware(app, controller=controller))
+    response = client.get("/low")
+    assert response.status_code == status and response.headers["retry-after"] == retry_after
+    assert "detail" in response.json()
+    # المسارات غير المصنفة تمر مباشرة
+    assert client.get("/other").content == b"ok"
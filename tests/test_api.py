@@ -0,0 +1,126 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import database, migrations, repository, timetable
+from app.database import SessionRouter, make_engine
+from app.main import app
+from app.memory import MemoryStore
+from app.models import Base
+
+QUESTIONS = [
+    {"q": "1 + 1", "choices": ["1", "2"], "answer": 1, "type": "mcq", "topic": "math"},
+    {"q": "2 + 2", "choices": ["4", "5"], "answer": 0, "type": "mcq", "topic": "math"},
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def client(request, tmp_path, monkeypatch):
+    # نفس نقاط النهاية فوق المحركين؛ يجب أن تعطي نفس النتائج
+    if request.param == "memory":
+        monkeypatch.setattr(repository, "_memory_store", MemoryStore())
+    else:
+        engine = make_engine(f"sqlite:///{tmp_path / 'app.db'}")
+        Base.metadata.create_all(bind=engine)
+        monkeypatch.setattr(repository, "_memory_store", None)
+        monkeypatch.setattr(repository, "_schema_cascades", migrations.apply_on_delete_rules(engine))
+        monkeypatch.setattr(database, "router", SessionRouter(engine, []))
+    timetable.schedules.invalidate()
+    yield TestClient(app)
+    timetable.schedules.invalidate()
+
+
+def register(client, email, class_="1"):
+    response = client.post("/api/register", json={"name": email, "email": email, "password": "secret", "class_": class_})
+    assert response.status_code == 200
+    return response.json()["user"]["id"]
+
+
+def save_exam(client, title, class_="1"):
+    exam = {"title": title, "class_": class_, "duration": 10, "questions": QUESTIONS, "confirmOnSubmit": True}
+    assert client.post("/api/save_exam", json=exam).status_code == 200
+    return next(e["id"] for e in client.get("/api/load_data").json()["exams"] if e["title"] == title)
+
+
+def submit(client, user_id, exam_id, answers=(1, 1)):
+    result = {"userId": user_id, "examId": exam_id, "at": 1, "studentAnswers": list(answers)}
+    return client.post("/api/submit_exam", json=result)
+
+
+def test_register_login_and_duplicate_email(client):
+    register(client, "a@example.com")
+    response = client.post("/api/register", json={"name": "b", "email": "a@example.com", "password": "x", "class_": "1"})
+    assert response.status_code == 400
+    assert client.post("/api/login", json={"email": "a@example.com", "password": "secret"}).status_code == 200
+    assert client.post("/api/login", json={"email": "a@example.com", "password": "wrong"}).status_code == 401
+
+
+def test_save_student_duplicate_email_is_400(client):
+    register(client, "a@example.com")
+    b = register(client, "b@example.com")
+    new = {"name": "c", "email": "a@example.com", "password": "x", "class_": "1"}
+    assert client.post("/api/save_student", json=new).status_code == 400
+    assert client.post("/api/save_student", json={**new, "id": b}).status_code == 400
+    emails = sorted(u["email"] for u in client.get("/api/load_data").json()["users"])
+    assert emails == ["a@example.com", "b@example.com"]
+
+
+def test_submit_exam_scores_answers(client):
+    user = register(client, "a@example.com")
+    exam = save_exam(client, "Quiz")
+    response = submit(client, user, exam, answers=(1, 1))
+    assert response.status_code == 200 and (response.json()["score"], response.json()["total"]) == (1, 2)
+    assert [r["score"] for r in client.get("/api/load_data").json()["results"]] == [1]
+
+
+def test_delete_student_and_exam_cascade(client):
+    a, b = register(client, "a@example.com"), register(client, "b@example.com")
+    exam, other = save_exam(client, "Quiz"), save_exam(client, "Other")
+    for user in (a, b):
+        submit(client, user, exam)
+        submit(client, user, other)
+    client.post("/api/save_student_schedule", json={"studentId": a, "day": "Sun", "time": "8:00", "subject": "Math"})
+
+    assert client.post("/api/delete_student", json={"id": a}).status_code == 200
+    data = client.get("/api/load_data").json()
+    assert {r["userId"] for r in data["results"]} == {b} and data["studentSchedules"] == {}
+
+    assert client.post("/api/delete_exam", json={"id": exam}).status_code == 200
+    assert [r["examId"] for r in client.get("/api/load_data").json()["results"]] == [other]
+
+
+def test_delete_module_detaches_lessons(client):
+    client.post("/api/save_module", json={"name": "M", "class_": "1"})
+    module = client.get("/api/load_data").json()["modules"][0]["id"]
+    client.post("/api/save_lesson", json={"title": "L", "class_": "1", "moduleId": module, "slides": ["s"]})
+    assert client.post("/api/delete_module", json={"id": module}).status_code == 200
+    assert [l["moduleId"] for l in client.get("/api/load_data").json()["lessons"]] == [None]
+
+
+def test_delete_class_returns_counts_per_table(client):
+    a, b = register(client, "a@example.com", "1"), register(client, "b@example.com", "1")
+    c = register(client, "c@example.com", "2")
+    exam = save_exam(client, "Quiz")
+    for user in (a, b, c):
+        submit(client, user, exam)
+    client.post("/api/save_student_schedule", json={"studentId": a, "day": "Sun", "time": "8:00", "subject": "Math"})
+
+    response = client.post("/api/delete_class", json={"class_": "1"})
+    assert response.json()["deleted"] == {"users": 2, "results": 2, "student_schedules": 1}
+    data = client.get("/api/load_data").json()
+    assert [u["id"] for u in data["users"]] == [c] and [r["userId"] for r in data["results"]] == [c]
+
+
+def test_retire_exams_returns_counts_per_table(client):
+    user = register(client, "a@example.com")
+    first, second = save_exam(client, "First", "1"), save_exam(client, "Second", "1")
+    kept = save_exam(client, "Kept", "2")
+    for exam in (first, second, kept):
+        submit(client, user, exam)
+
+    assert client.post("/api/retire_exams", json={}).status_code == 400
+    response = client.post("/api/retire_exams", json={"ids": [first]})
+    assert response.json()["deleted"] == {"exams": 1, "results": 1}
+    response = client.post("/api/retire_exams", json={"class_": "1"})
+    assert response.json()["deleted"] == {"exams": 1, "results": 1}
+    data = client.get("/api/load_data").json()
+    assert [e["id"] for e in data["exams"]] == [kept] and [r["examId"] for r in data["results"]] == [kept]
@@ -0,0 +1,129 @@
+import asyncio, gzip, json, threading
+
+import pytest
+from starlette.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+
+BODY = json.dumps([{"id": i, "title": f"lesson {i * 7919 % 1013}", "order": i * 31 % 97} for i in range(2000)]).encode()
+
+
+def make_app(content_type, chunks):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+async def call(middleware, path, accept_encoding=b"gzip"):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": [(b"accept-encoding", accept_encoding)]}
+    await middleware(scope, receive, send)
+    return sent
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    compression.metrics.reset()
+    compression.cache.clear()
+
+
+@pytest.fixture
+def gzip_calls(monkeypatch):
+    # يعد مرات الضغط الفعلية (مع مستوى كل منها)
+    calls = []
+
+    def counting_gzip(body, best=False):
+        calls.append(best)
+        return gzip.compress(body, compresslevel=compression.GZIP_BEST_LEVEL if best else compression.GZIP_LEVEL)
+
+    monkeypatch.setitem(compression.ENCODERS, "gzip", counting_gzip)
+    return calls
+
+
+def test_negotiate_prefers_br_and_respects_q_zero():
+    assert negotiate("gzip") == "gzip"
+    assert negotiate("") is None and negotiate("identity") is None
+    assert negotiate("gzip;q=0") is None
+    if compression.brotli is not None:
+        assert negotiate("gzip, deflate, br") == "br"
+        assert negotiate("*") == "br"
+        assert negotiate("br;q=0, gzip") == "gzip"
+        assert negotiate("br;q=0.5, gzip;q=0.8") == "gzip"
+        assert negotiate("*, br;q=0") == "gzip"
+
+
+def test_non_compressible_response_streams_through():
+    middleware = CompressionMiddleware(make_app(b"image/png", [b"a" * 600, b"b" * 600]))
+    sent = asyncio.run(call(middleware, "/x"))
+    assert [m.get("body") for m in sent[1:]] == [b"a" * 600, b"b" * 600]
+    assert all(name != b"content-encoding" for name, _ in sent[0]["headers"])
+    assert compression.metrics.skipped == 1
+
+
+def test_bodies_below_minimum_size_are_not_compressed(gzip_calls):
+    client = TestClient(CompressionMiddleware(make_app(b"application/json", [b"x" * 499]), minimum_size=500))
+    response = client.get("/x", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers and response.content == b"x" * 499
+    client = TestClient(CompressionMiddleware(make_app(b"application/json", [b"x" * 500]), minimum_size=500))
+    assert client.get("/x", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+    assert compression.metrics.skipped == 1 and gzip_calls == [False]
+
+
+def test_cache_hit_does_not_compress_again(gzip_calls):
+    client = TestClient(CompressionMiddleware(make_app(b"application/json", [BODY]), cacheable_paths=("/cached",)))
+    for _ in range(3):
+        response = client.get("/cached", headers={"Accept-Encoding": "gzip"})
+        assert response.content == BODY
+    snapshot = compression.metrics.snapshot()
+    assert gzip_calls == [False]
+    assert (snapshot["cacheMisses"], snapshot["cacheHits"]) == (1, 2)
+    assert snapshot["encodings"]["gzip"]["responses"] == 3 and snapshot["cacheBytes"] > 0
+
+
+def test_only_best_quality_paths_use_the_highest_level(gzip_calls):
+    app = CompressionMiddleware(
+        make_app(b"application/json", [BODY]),
+        cacheable_paths=("/slides", "/load_data"), best_quality_paths=("/slides",),
+    )
+    client = TestClient(app)
+    for path, level in (("/slides", compression.GZIP_BEST_LEVEL), ("/load_data", compression.GZIP_LEVEL)):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert response.content == BODY
+        assert len(gzip.compress(BODY, compresslevel=level)) == int(response.headers["content-length"])
+    assert gzip_calls == [True, False]
+
+
+def test_concurrent_misses_share_one_compression(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_gzip(body, best=False):
+        calls.append(best)
+        started.set()
+        release.wait(5)
+        return gzip.compress(body)
+
+    monkeypatch.setitem(compression.ENCODERS, "gzip", slow_gzip)
+    middleware = CompressionMiddleware(make_app(b"application/json", [BODY]), cacheable_paths=("/cached",))
+
+    async def run():
+        requests = [asyncio.ensure_future(call(middleware, "/cached")) for _ in range(4)]
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(gzip.decompress(sent[1]["body"]) == BODY for sent in results)
+    assert (compression.metrics.cache_misses, compression.metrics.cache_hits) == (1, 3)
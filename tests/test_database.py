@@ -0,0 +1,100 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.database import SessionRouter, make_engine
+
+
+def create_marker(url, name):
+    # جدول صغير في كل ملف يبين أي قاعدة أجابت على الاستعلام
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE whoami (name TEXT)"))
+        conn.execute(text("INSERT INTO whoami VALUES (:name)"), {"name": name})
+    engine.dispose()
+
+
+def whoami(session):
+    try:
+        return session.execute(text("SELECT name FROM whoami")).scalar()
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def sqlite_urls(tmp_path):
+    urls = {}
+    for name in ("primary", "replica", "replica2"):
+        urls[name] = f"sqlite:///{tmp_path / (name + '.db')}"
+        create_marker(urls[name], name)
+    return urls
+
+
+@pytest.fixture
+def router(sqlite_urls):
+    return SessionRouter(make_engine(sqlite_urls["primary"]), [sqlite_urls["replica"]], sticky_seconds=0.5)
+
+
+def test_reads_go_to_replica(router):
+    assert whoami(router.read_session()) == "replica"
+    assert whoami(router.read_session("student-1")) == "replica"
+
+
+def test_writes_go_to_primary(router):
+    assert whoami(router.write_session("student-1")) == "primary"
+
+
+def test_read_after_write_is_sticky_to_primary(router):
+    router.write_session("student-1").close()
+    assert whoami(router.read_session("student-1")) == "primary"
+    # مستخدم آخر لا يتأثر بكتابة الأول
+    assert whoami(router.read_session("student-2")) == "replica"
+    time.sleep(router.sticky_seconds)
+    assert whoami(router.read_session("student-1")) == "replica"
+
+
+def test_no_stickiness_without_client_key(router):
+    router.write_session(None).close()
+    assert whoami(router.read_session(None)) == "replica"
+
+
+def test_unreachable_replica_falls_back_to_primary(sqlite_urls, tmp_path):
+    missing = f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+    router = SessionRouter(make_engine(sqlite_urls["primary"]), [missing])
+    assert whoami(router.read_session()) == "primary"
+    assert router.is_healthy(0) is False
+
+
+def test_round_robin_across_replicas(sqlite_urls):
+    router = SessionRouter(
+        make_engine(sqlite_urls["primary"]), [sqlite_urls["replica"], sqlite_urls["replica2"]]
+    )
+    names = [whoami(router.read_session()) for _ in range(4)]
+    assert names == ["replica", "replica2", "replica", "replica2"]
+
+
+def test_round_robin_skips_unhealthy_replica(sqlite_urls, tmp_path):
+    missing = f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+    router = SessionRouter(make_engine(sqlite_urls["primary"]), [missing, sqlite_urls["replica2"]])
+    assert [whoami(router.read_session()) for _ in range(3)] == ["replica2"] * 3
+
+
+def test_login_right_after_register_reads_the_primary(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import database, models, repository
+    from app.main import app
+
+    urls = {name: f"sqlite:///{tmp_path / (name + '.db')}" for name in ("primary", "replica")}
+    engines = {name: make_engine(url) for name, url in urls.items()}
+    for engine in engines.values():
+        models.Base.metadata.create_all(bind=engine)
+    # النسخة المتماثلة متأخرة: لا تحتوي على المستخدم الجديد أبداً
+    monkeypatch.setattr(repository, "_memory_store", None)
+    monkeypatch.setattr(database, "router", SessionRouter(engines["primary"], [urls["replica"]]))
+
+    client = TestClient(app)
+    user = {"name": "a", "email": "a@example.com", "password": "secret", "class_": "1"}
+    assert client.post("/api/register", json=user).status_code == 200
+    response = client.post("/api/login", json={"email": "a@example.com", "password": "secret"})
+    assert response.status_code == 200 and response.json()["user"]["email"] == "a@example.com"
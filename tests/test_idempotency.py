@@ -0,0 +1,146 @@
+import asyncio, json
+
+import pytest
+from starlette.testclient import TestClient
+
+from app import idempotency
+from app.idempotency import IdempotencyMiddleware, IdempotencyStore
+
+
+def make_client():
+    calls = []
+
+    async def app(scope, receive, send):
+        message = await receive()
+        calls.append(message["body"])
+        body = json.dumps({"call": len(calls)}).encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    return TestClient(IdempotencyMiddleware(app, store=IdempotencyStore())), calls
+
+
+def post(client, body=b"{}", user="a", key="k"):
+    return client.post("/api/submit_exam", content=body, headers={"Idempotency-Key": key, "X-User-Id": user})
+
+
+async def call(middleware, body=b"{}", key=b"k"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/api/submit_exam", "query_string": b"",
+             "headers": [(b"idempotency-key", key), (b"x-user-id", b"a")]}
+    await middleware(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_same_key_is_replayed_for_the_same_user_only():
+    client, calls = make_client()
+    first, again, other = post(client), post(client), post(client, user="b")
+    assert again.headers["idempotent-replayed"] == "true" and again.json() == first.json()
+    assert "idempotent-replayed" not in other.headers and other.json() == {"call": 2}
+    assert len(calls) == 2
+
+
+def test_key_reused_with_a_different_body_is_422():
+    client, calls = make_client()
+    post(client, body=b'{"answers": [1]}')
+    assert post(client, body=b'{"answers": [2]}').status_code == 422
+    assert len(calls) == 1
+
+
+def test_concurrent_duplicates_wait_for_the_original_and_run_once():
+    calls = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            calls.append((await receive())["body"])
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": b'{"ok": true}'})
+
+        middleware = IdempotencyMiddleware(app, store=IdempotencyStore())
+        requests = [asyncio.ensure_future(call(middleware)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(status == 200 and body == b'{"ok": true}' for status, _, body in results)
+    assert sum(headers.get(b"idempotent-replayed") == b"true" for _, headers, _ in results) == 4
+
+
+@pytest.mark.parametrize("failure", ["status", "exception"])
+def test_failed_original_releases_the_key(failure):
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append((await receive())["body"])
+        if len(calls) == 1:
+            if failure == "exception":
+                raise RuntimeError("database is down")
+            await send({"type": "http.response.start", "status": 503, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"done"})
+
+    client = TestClient(IdempotencyMiddleware(app, store=IdempotencyStore()), raise_server_exceptions=False)
+    assert post(client).status_code in (500, 503)
+    retry = post(client)
+    assert retry.status_code == 200 and retry.content == b"done" and "idempotent-replayed" not in retry.headers
+    assert len(calls) == 2
+
+
+def test_duplicate_gets_409_when_the_original_takes_too_long(monkeypatch):
+    monkeypatch.setattr(idempotency, "IN_FLIGHT_WAIT", 0.05)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await receive()
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"done"})
+
+        middleware = IdempotencyMiddleware(app, store=IdempotencyStore())
+        original = asyncio.ensure_future(call(middleware))
+        await asyncio.sleep(0.01)
+        duplicate = await call(middleware)
+        release.set()
+        return await original, duplicate
+
+    original, (status, headers, _) = asyncio.run(run())
+    assert original[0] == 200
+    assert status == 409 and headers[b"retry-after"] == b"1"
+
+
+def test_entries_expire_and_are_purged(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(idempotency.time, "monotonic", lambda: now[0])
+    store = IdempotencyStore(ttl=60, max_keys=2)
+
+    first = store.begin("first", "f")
+    store.finish(first, (200, [], b""))
+    now[0] += 61
+    assert store.get("first") is None
+
+    done = store.begin("done", "d")
+    store.finish(done, (200, [], b""))
+    running = store.begin("running", "r")
+    store.begin("new", "n")
+    # الأقدم المنتهي يُحذف عند الامتلاء، والطلب الجاري يبقى
+    assert store.get("done") is None
+    assert store.get("running") is running and store.get("new") is not None
+    now[0] += 61
+    store.begin("later", "l")
+    assert store.get("running") is None
@@ -0,0 +1,111 @@
+import pytest
+
+from app.memory import MemoryRepository, MemoryStore
+
+
+@pytest.fixture
+def store():
+    return MemoryStore()
+
+
+def add_student(repo, id, email, class_="1"):
+    return repo.insert("users", {"id": id, "name": id, "email": email, "password": "x", "class_": class_})
+
+
+def test_insert_fills_defaults_and_indexes(store):
+    repo = MemoryRepository(store)
+    user = add_student(repo, "a", "a@example.com", class_="3")
+    repo.commit()
+    assert user["role"] == "student" and user["isActive"] is True
+    assert [u["id"] for u in repo.find("users", class_="3")] == ["a"]
+    assert repo.find_one("users", email="a@example.com")["id"] == "a"
+
+
+def test_uncommitted_writes_are_invisible_to_other_repositories(store):
+    writer, reader = MemoryRepository(store), MemoryRepository(store)
+    add_student(writer, "a", "a@example.com")
+    assert writer.get("users", "a") is not None
+    assert reader.get("users", "a") is None
+    assert reader.find("users", class_="1") == []
+    writer.commit()
+    assert reader.get("users", "a")["email"] == "a@example.com"
+
+
+def test_rollback_does_not_overwrite_other_commits(store):
+    setup = MemoryRepository(store)
+    add_student(setup, "a", "a@example.com")
+    setup.commit()
+
+    first, second = MemoryRepository(store), MemoryRepository(store)
+    first.update("users", "a", {"name": "first"})
+    second.update("users", "a", {"name": "second"})
+    second.commit()
+    first.rollback()
+    assert MemoryRepository(store).get("users", "a")["name"] == "second"
+
+
+def test_commit_only_applies_changed_fields(store):
+    setup = MemoryRepository(store)
+    add_student(setup, "a", "a@example.com")
+    setup.commit()
+
+    first, second = MemoryRepository(store), MemoryRepository(store)
+    first.update("users", "a", {"name": "renamed"})
+    second.update("users", "a", {"class_": "2"})
+    second.commit()
+    first.commit()
+    row = MemoryRepository(store).get("users", "a")
+    assert (row["name"], row["class_"]) == ("renamed", "2")
+
+
+def test_duplicate_email_is_rejected(store):
+    repo = MemoryRepository(store)
+    add_student(repo, "a", "a@example.com")
+    with pytest.raises(ValueError, match="Duplicate entry"):
+        add_student(repo, "b", "a@example.com")
+
+
+def test_failed_commit_leaves_store_unchanged(store):
+    first, second = MemoryRepository(store), MemoryRepository(store)
+    add_student(first, "a", "a@example.com")
+    add_student(second, "b", "new@example.com")
+    add_student(second, "c", "a@example.com")
+    first.commit()
+    with pytest.raises(ValueError, match="Duplicate entry"):
+        second.commit()
+    repo = MemoryRepository(store)
+    assert repo.get("users", "b") is None
+    assert [u["id"] for u in repo.all("users")] == ["a"]
+
+
+def test_delete_applies_on_delete_rules(store):
+    repo = MemoryRepository(store)
+    add_student(repo, "a", "a@example.com")
+    add_student(repo, "b", "b@example.com", class_="2")
+    repo.insert("exams", {"id": "e", "title": "t", "class_": "1", "questions": []})
+    repo.insert("results", {"id": "r1", "userId": "a", "examId": "e"})
+    repo.insert("results", {"id": "r2", "userId": "b", "examId": "e"})
+    repo.insert("student_schedules", {"studentId": "a", "day": "Sun", "time": "8", "subject": "Math"})
+    repo.insert("modules", {"id": "m", "name": "m", "class_": "1"})
+    repo.insert("lessons", {"id": "l", "title": "l", "class_": "1", "moduleId": "m"})
+    repo.commit()
+
+    assert repo.delete_many("users", class_="1") == {"users": 1, "results": 1, "student_schedules": 1}
+    assert repo.delete("modules", "m") == 1
+    repo.commit()
+    assert [r["id"] for r in repo.all("results")] == ["r2"]
+    assert repo.get("lessons", "l")["moduleId"] is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    repo = MemoryRepository(MemoryStore(path))
+    add_student(repo, "a", "a@example.com")
+    repo.insert("student_schedules", {"studentId": "a", "day": "Sun", "time": "8", "subject": "Math"})
+    repo.commit()
+    repo.store.save_snapshot(force=True)
+
+    reloaded = MemoryRepository(MemoryStore(path))
+    assert reloaded.get("users", "a")["email"] == "a@example.com"
+    entry = reloaded.insert("student_schedules", {"studentId": "a", "day": "Sun", "time": "9", "subject": "Sci"})
+    assert entry["id"] == 2
@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app import migrations, repository
+from app.database import make_engine
+from app.repository import SQLRepository
+
+# نفس الجداول قبل إضافة قواعد ON DELETE (كما أنشأها create_all في النسخ السابقة)
+OLD_SCHEMA = [
+    "CREATE TABLE users (id VARCHAR(255) PRIMARY KEY, name VARCHAR(255), email VARCHAR(255) UNIQUE,"
+    " password VARCHAR(255), role VARCHAR(50), class VARCHAR(50), isActive BOOLEAN)",
+    "CREATE TABLE modules (id VARCHAR(255) PRIMARY KEY, name VARCHAR(255), description TEXT, class VARCHAR(50),"
+    " \"order\" INTEGER, isVisible BOOLEAN)",
+    "CREATE TABLE lessons (id VARCHAR(255) PRIMARY KEY, title VARCHAR(255), description TEXT, class VARCHAR(50),"
+    " moduleId VARCHAR(255) REFERENCES modules(id), \"order\" INTEGER, isVisible BOOLEAN, slides JSON,"
+    " createdAt BIGINT)",
+    "CREATE TABLE exams (id VARCHAR(255) PRIMARY KEY, title VARCHAR(255), class VARCHAR(50), duration INTEGER,"
+    " questions JSON, confirmOnSubmit BOOLEAN)",
+    "CREATE TABLE results (id VARCHAR(255) PRIMARY KEY, userId VARCHAR(255) REFERENCES users(id),"
+    " examId VARCHAR(255) REFERENCES exams(id), score INTEGER, total INTEGER, at BIGINT, studentAnswers JSON)",
+    "CREATE TABLE student_schedules (id INTEGER PRIMARY KEY, studentId VARCHAR(255) REFERENCES users(id),"
+    " day VARCHAR(50), time VARCHAR(50), subject VARCHAR(255), teacher VARCHAR(255))",
+]
+
+
+@pytest.fixture
+def old_engine(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO users (id, name, email) VALUES ('s1', 's1', 's1@example.com')"))
+        conn.execute(text("INSERT INTO modules (id, name) VALUES ('m1', 'm1')"))
+        conn.execute(text("INSERT INTO lessons (id, title, moduleId) VALUES ('l1', 'l1', 'm1')"))
+        conn.execute(text("INSERT INTO exams (id, title) VALUES ('e1', 'e1')"))
+        conn.execute(text("INSERT INTO results (id, userId, examId, score) VALUES ('r1', 's1', 'e1', 9)"))
+        conn.execute(text("INSERT INTO student_schedules (studentId, day, time) VALUES ('s1', 'Sun', '8:00')"))
+    yield engine
+    engine.dispose()
+
+
+def count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def test_migration_adds_on_delete_rules_and_keeps_data(old_engine):
+    assert len(migrations.missing_rules(old_engine)) == 4
+    assert migrations.apply_on_delete_rules(old_engine) is True
+    assert migrations.missing_rules(old_engine) == []
+    assert count(old_engine, "results") == 1 and count(old_engine, "student_schedules") == 1
+
+    with old_engine.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE id = 's1'"))
+        conn.execute(text("DELETE FROM modules WHERE id = 'm1'"))
+        assert conn.execute(text("SELECT moduleId FROM lessons WHERE id = 'l1'")).scalar() is None
+    assert count(old_engine, "results") == 0 and count(old_engine, "student_schedules") == 0
+
+    # التشغيل مرة ثانية لا يغير شيئاً
+    assert migrations.apply_on_delete_rules(old_engine) is True
+
+
+def test_delete_where_removes_children_until_migrated(old_engine, monkeypatch):
+    monkeypatch.setattr(repository, "_schema_cascades", False)
+    repo = SQLRepository(sessionmaker(bind=old_engine)())
+    try:
+        assert repo.delete_many("users", id=["s1"]) == {"users": 1, "results": 1, "student_schedules": 1}
+        repo.delete("modules", "m1")
+        repo.commit()
+        assert repo.get("lessons", "l1")["moduleId"] is None
+    finally:
+        repo.close()
+    assert count(old_engine, "results") == 0 and count(old_engine, "student_schedules") == 0
+
+
+def add_orphans(engine):
+    # بيانات قديمة تشير إلى صفوف محذوفة (كانت ممكنة بدون مفاتيح مفعلة)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.execute(text("INSERT INTO results (id, userId, examId, score) VALUES ('r2', 'gone', 'e1', 1)"))
+        conn.execute(text("INSERT INTO lessons (id, title, moduleId) VALUES ('l2', 'l2', 'gone')"))
+        conn.commit()
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+
+def test_orphan_rows_block_the_migration_unless_cleaning_is_requested(old_engine, capsys):
+    add_orphans(old_engine)
+    assert migrations.apply_on_delete_rules(old_engine, clean_orphans=False) is False
+    output = capsys.readouterr().out
+    assert "1 rows in results.userId" in output and "1 rows in lessons.moduleId" in output
+    # لم يتغير أي صف، والجداول الأخرى رُحّلت
+    assert count(old_engine, "results") == 2
+    assert {(t.name, fk.parent.name) for t, fk, _ in migrations.missing_rules(old_engine)} == {
+        ("lessons", "moduleId"), ("results", "userId"), ("results", "examId"),
+    }
+
+    assert migrations.apply_on_delete_rules(old_engine, clean_orphans=True) is True
+    output = capsys.readouterr().out
+    assert "deleting 1 orphan rows from results.userId" in output
+    assert "setting lessons.moduleId to NULL on 1 orphan rows" in output
+    assert count(old_engine, "results") == 1
+    with old_engine.connect() as conn:
+        assert conn.execute(text("SELECT moduleId FROM lessons WHERE id = 'l2'")).scalar() is None
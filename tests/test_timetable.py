@@ -0,0 +1,131 @@
+import pytest
+
+from app import repository
+from app.memory import MemoryRepository, MemoryStore
+from app.timetable import Timetable
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = MemoryStore()
+    monkeypatch.setattr(repository, "_memory_store", store)
+    repo = MemoryRepository(store)
+    repo.insert("users", {"id": "s1", "name": "s1", "email": "s1@example.com", "password": "x", "class_": "1"})
+    repo.insert("student_schedules", {"studentId": "s1", "day": "Sun", "time": "8:00", "subject": "Math", "teacher": "A"})
+    repo.commit()
+    return store
+
+
+def save(store, subject, teacher):
+    repo = MemoryRepository(store)
+    row = repo.find_one("student_schedules", studentId="s1", day="Sun", time="8:00")
+    repo.update("student_schedules", row["id"], {"subject": subject, "teacher": teacher})
+    repo.commit()
+    return {**row, "subject": subject, "teacher": teacher}
+
+
+def test_out_of_order_updates_keep_last_commit(store):
+    schedules = Timetable()
+    schedules.ensure_loaded()
+    first = save(store, "Physics", "B")
+    second = save(store, "Chemistry", "C")
+    # التحديث الثاني يصل إلى الذاكرة قبل الأول
+    schedules.save_entry(second)
+    schedules.save_entry(first)
+    assert schedules.student_schedule("s1") == {"Sun": [{"day": "Sun", "time": "8:00", "subject": "Chemistry", "teacher": "C"}]}
+    assert list(schedules.class_schedule("1")["Sun"]["8:00"]) == [{"subject": "Chemistry", "teacher": "C", "students": 1}]
+
+
+def test_delete_entry_keeps_row_saved_again(store):
+    schedules = Timetable()
+    schedules.ensure_loaded()
+    repo = MemoryRepository(store)
+    repo.delete_where("student_schedules", studentId="s1", day="Sun", time="8:00")
+    repo.commit()
+    repo.insert("student_schedules", {"studentId": "s1", "day": "Sun", "time": "8:00", "subject": "Art", "teacher": "D"})
+    repo.commit()
+    schedules.delete_entry("s1", "Sun", "8:00")
+    assert schedules.student_schedule("s1")["Sun"][0]["subject"] == "Art"
+
+
+def add(store, student_id, class_, day="Mon", time_="9:00", subject="Math", teacher="T"):
+    repo = MemoryRepository(store)
+    if repo.get("users", student_id) is None:
+        repo.insert("users", {"id": student_id, "name": student_id, "email": f"{student_id}@example.com",
+                              "password": "x", "class_": class_})
+    row = repo.insert("student_schedules", {"studentId": student_id, "day": day, "time": time_,
+                                            "subject": subject, "teacher": teacher})
+    repo.commit()
+    return row
+
+
+def conflicts(schedules):
+    return [(c["teacher"], c["day"], c["time"], sorted((b["class_"], b["students"]) for b in c["bookings"]))
+            for c in schedules.teacher_conflicts()]
+
+
+def test_teacher_conflict_appears_and_disappears(store):
+    schedules = Timetable()
+    schedules.ensure_loaded()
+    schedules.save_entry(add(store, "a", "1"))
+    schedules.save_entry(add(store, "b", "1"))
+    # نفس الصف ونفس المادة ليس تعارضاً
+    assert schedules.teacher_conflicts() == []
+    assert schedules.class_schedule("1")["Mon"]["9:00"] == [{"subject": "Math", "teacher": "T", "students": 2}]
+
+    c = add(store, "c", "2")
+    schedules.save_entry(c)
+    assert conflicts(schedules) == [("T", "Mon", "9:00", [("1", 2), ("2", 1)])]
+    assert schedules.teacher_conflicts("other") == []
+
+    # إعادة إسناد الحصة لمعلم آخر تزيل التعارض
+    repo = MemoryRepository(store)
+    repo.update("student_schedules", c["id"], {"teacher": "U"})
+    repo.commit()
+    schedules.save_entry(c)
+    assert schedules.teacher_conflicts() == []
+
+    schedules.save_entry(add(store, "d", "3"))
+    assert conflicts(schedules) == [("T", "Mon", "9:00", [("1", 2), ("3", 1)])]
+    repo.delete_where("student_schedules", studentId="d")
+    repo.commit()
+    schedules.delete_entry("d", "Mon", "9:00")
+    assert schedules.teacher_conflicts() == []
+    assert ("T", "Mon", "9:00") in schedules.teacher_slots
+    assert "Mon" not in schedules.students["d"] and schedules.class_schedule("3") == {}
+
+
+def test_set_student_class_moves_bookings(store):
+    schedules = Timetable()
+    schedules.ensure_loaded()
+    schedules.save_entry(add(store, "a", "1"))
+    schedules.save_entry(add(store, "b", "2"))
+    assert len(schedules.teacher_conflicts()) == 1
+
+    schedules.set_student_class("b", "1")
+    assert schedules.class_schedule("1")["Mon"]["9:00"] == [{"subject": "Math", "teacher": "T", "students": 2}]
+    assert schedules.class_schedule("2") == {}
+    assert schedules.teacher_conflicts() == []
+
+
+def test_remove_student_and_invalidate_after_delete_class(store):
+    schedules = Timetable()
+    schedules.ensure_loaded()
+    schedules.save_entry(add(store, "a", "3"))
+    schedules.save_entry(add(store, "b", "2"))
+
+    repo = MemoryRepository(store)
+    repo.delete("users", "b")
+    repo.commit()
+    schedules.remove_student("b")
+    assert "b" not in schedules.all_student_schedules() and schedules.teacher_conflicts() == []
+    assert schedules.teacher_slots[("T", "Mon", "9:00")] == {("3", "Math"): 1}
+
+    # delete_class يحذف بجملة واحدة ثم يبطل الجدول كله؛ يُعاد بناؤه عند أول قراءة
+    repo.delete_many("users", class_="3")
+    repo.commit()
+    assert "a" in schedules.all_student_schedules()
+    schedules.invalidate()
+    assert schedules.all_student_schedules() == {"s1": {"Sun": [{"day": "Sun", "time": "8:00", "subject": "Math", "teacher": "A"}]}}
+    assert schedules.class_schedule("1") == {"Sun": {"8:00": [{"subject": "Math", "teacher": "A", "students": 1}]}}
+    assert schedules.teacher_slots == {("A", "Sun", "8:00"): {("1", "Math"): 1}}